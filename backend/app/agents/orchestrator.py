@@ -2,7 +2,12 @@ from typing import TypedDict, Literal
 from langgraph.graph import StateGraph, END
 from llama_index.llms.gemini import Gemini
 from llama_index.core import Settings
-import json
+from app.core.config import settings
+from app.core.intent import IntentClassifier, extract_hours_per_week, extract_topic
+from app.agents.request_slots import RequestSlots, parse_slots, slots_prompt
+from app.agents.roadmap import json_mode
+from app.core.telemetry import traced
+from datetime import datetime, timezone, tzinfo
 
 class OrchestratorState(TypedDict):
     input_text: str
@@ -10,17 +15,27 @@ class OrchestratorState(TypedDict):
     planner_state: dict
     scheduler_state: dict
     final_response: str
+    slots: dict # RequestSlots.model_dump()
     creds: object
+    timezone: object # client tzinfo, None for UTC
 
 class OrchestratorAgent:
     def __init__(self):
         self.llm = Settings.llm
+        # Rules / embeddings / cache resolve most inputs; the LLM is only the fallback
+        self.classifier = IntentClassifier(
+            llm_fallback=self.parse_with_llm,
+            embed_model=Settings.embedding_model if settings.INTENT_EMBEDDINGS_ENABLED else None,
+            resolve_local=self.resolve_local,
+            # Relative times ("tomorrow at 3pm") go stale, so schedule results are never cached
+            cacheable=lambda slots: slots.intent != "schedule"
+        )
         
         self.workflow = StateGraph(OrchestratorState)
         
-        self.workflow.add_node("classify_intent", self.classify_intent)
-        self.workflow.add_node("run_planner", self.run_planner)
-        self.workflow.add_node("run_scheduler", self.run_scheduler)
+        self.workflow.add_node("classify_intent", traced("node", "orchestrator.classify_intent")(self.classify_intent))
+        self.workflow.add_node("run_planner", traced("node", "orchestrator.run_planner")(self.run_planner))
+        self.workflow.add_node("run_scheduler", traced("node", "orchestrator.run_scheduler")(self.run_scheduler))
         
         self.workflow.set_entry_point("classify_intent")
         
@@ -39,34 +54,51 @@ class OrchestratorAgent:
         
         self.app = self.workflow.compile()
 
-    def classify_intent(self, state: OrchestratorState):
+    def resolve_local(self, intent: str, input_text: str):
+        # "learn" is answered without the LLM when a topic can be pulled out of the text;
+        # "schedule" always needs the LLM to resolve its times
+        if intent == "learn":
+            topic = extract_topic(input_text)
+            if topic:
+                return RequestSlots(intent="learn", topic=topic, hours_per_week=extract_hours_per_week(input_text))
+        return None
+
+    async def classify_intent(self, state: OrchestratorState):
         print(f"Classifying intent for: {state['input_text']}")
-        prompt = f"""
-        Classify the following user input into one of these intents:
-        - "learn": User wants to learn a topic, study something, or create a roadmap.
-        - "schedule": User wants to check availability or schedule a specific meeting.
-        - "unknown": Anything else.
-        
-        Input: "{state['input_text']}"
-        
-        Return ONLY the intent string.
-        """
-        response = self.llm.complete(prompt)
-        intent = response.text.strip().lower()
-        if intent not in ["learn", "schedule"]:
-            intent = "unknown"
-            
-        print(f"Detected intent: {intent}")
-        return {"intent": intent}
+        slots = await self.classifier.classify(state['input_text'], tz=state.get('timezone'))
+        print(f"Detected intent: {slots.intent}")
+        return {"intent": slots.intent, "slots": slots.model_dump()}
+
+    async def parse_with_llm(self, input_text: str, tz: tzinfo = None) -> RequestSlots:
+        # One structured call returns the intent together with its slots. "Tomorrow at 3pm" is
+        # resolved in the client's timezone, then stored as naive UTC
+        now = datetime.now(tz or timezone.utc)
+        prompt = slots_prompt(input_text, now.replace(tzinfo=None), str(tz or "UTC"))
+        response = await self.llm.acomplete(prompt, **json_mode(self.llm))
+        return parse_slots(response.text, tz=tz)
 
     def run_planner(self, state: OrchestratorState):
         print("Routing to Planner...")
-        # Extract topic from input (simplistic extraction for now)
-        topic = state['input_text'].replace("I want to learn", "").replace("about", "").strip()
+        slots = state['slots']
+        topic = slots.get('topic') or extract_topic(state['input_text']) or state['input_text']
         
         # We just return the intent and topic, letting the main app handle the stateful agent execution
-        return {"intent": "learn", "final_response": f"Starting research on {topic}...", "planner_state": {"topic": topic}}
+        return {
+            "intent": "learn",
+            "final_response": f"Starting research on {topic}...",
+            "planner_state": {"topic": topic, "hours_per_week": slots.get('hours_per_week')}
+        }
 
     def run_scheduler(self, state: OrchestratorState):
         print("Routing to Scheduler...")
-        return {"intent": "schedule", "final_response": "Scheduler logic triggered."}
+        slots = state['slots']
+        # Times are passed straight to SchedulerAgent by the main app; no second LLM call
+        return {
+            "intent": "schedule",
+            "final_response": "Checking your calendar...",
+            "scheduler_state": {
+                "start_time": slots.get('start_time'),
+                "end_time": slots.get('end_time'),
+                "summary": slots.get('summary')
+            }
+        }
@@ -1,13 +1,22 @@
 from typing import TypedDict, List, Optional
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from app.tools.google_calendar import GoogleCalendarTool
 from app.tools.researcher import ResearcherTool
+from app.core.session_scheduler import SchedulingConstraints, SessionScheduler, parse_hour_range
+from app.core.checkpoint import CheckpointStore
+from app.core.intent import fold
+from app.core.config import DEFAULT_OWNER, settings
+from app.core.telemetry import traced
+from app.agents.roadmap import (
+    RoadmapParseError, apply_patch, json_mode, parse_patch, parse_roadmap, parse_stats,
+    retry_prompt, revision_prompt
+)
 from datetime import datetime, timedelta
 from llama_index.llms.gemini import Gemini
 from llama_index.core import Settings
-import json
-import re
+import asyncio
 
 class PlannerState(TypedDict):
     topic: str
@@ -15,34 +24,38 @@ class PlannerState(TypedDict):
     research_summary: str
     roadmap: List[dict] # List of {topic, duration_hours}
     scheduled_plan: List[dict] # List of {topic, start, end}
-    creds: object # Google Credentials
     feedback: Optional[str]
     approved: bool
 
 class PlannerAgent:
-    def __init__(self):
+    def __init__(self, checkpoints: CheckpointStore = None):
         self.researcher = ResearcherTool()
         self.calendar = GoogleCalendarTool()
         self.llm = Settings.llm # Use the configured Gemini LLM
-        self.checkpointer = MemorySaver()
+        # Google credentials are not part of PlannerState; pass them per call as
+        # config["configurable"]["creds"] so checkpoints stay serializable
+        self.checkpoints = checkpoints or CheckpointStore()
         
         self.workflow = StateGraph(PlannerState)
         
-        self.workflow.add_node("research_topic", self.research_topic)
-        self.workflow.add_node("generate_roadmap", self.generate_roadmap)
-        self.workflow.add_node("human_approval", self.human_approval)
-        self.workflow.add_node("schedule_roadmap", self.schedule_roadmap)
+        self.workflow.add_node("research_topic", traced("node", "planner.research_topic")(self.research_topic))
+        self.workflow.add_node("generate_roadmap", traced("node", "planner.generate_roadmap")(self.generate_roadmap))
+        self.workflow.add_node("revise_roadmap", traced("node", "planner.revise_roadmap")(self.revise_roadmap))
+        self.workflow.add_node("human_approval", traced("node", "planner.human_approval")(self.human_approval))
+        self.workflow.add_node("schedule_roadmap", traced("node", "planner.schedule_roadmap")(self.schedule_roadmap))
         
         self.workflow.set_entry_point("research_topic")
         
         self.workflow.add_edge("research_topic", "generate_roadmap")
         self.workflow.add_edge("generate_roadmap", "human_approval")
+        self.workflow.add_edge("revise_roadmap", "human_approval")
         
         self.workflow.add_conditional_edges(
             "human_approval",
             self.check_approval,
             {
                 "approved": "schedule_roadmap",
+                "revise": "revise_roadmap",
                 "feedback": "generate_roadmap",
                 "wait": END # Should not happen if interrupted correctly
             }
@@ -50,16 +63,38 @@ class PlannerAgent:
         
         self.workflow.add_edge("schedule_roadmap", END)
         
-        # Interrupt before human_approval to allow user input
-        self.app = self.workflow.compile(checkpointer=self.checkpointer, interrupt_before=["human_approval"])
+        self._app = None
 
-    def research_topic(self, state: PlannerState):
+    @property
+    def app(self):
+        # Compiled on first use: persistent checkpointers are only available once set up
+        if self._app is None:
+            # Interrupt before human_approval to allow user input
+            self._app = self.workflow.compile(checkpointer=self.checkpoints.saver, interrupt_before=["human_approval"])
+        return self._app
+
+    async def research(self, topic: str, owner: str = DEFAULT_OWNER) -> str:
+        # Only search the requesting user's own knowledge base
+        return await self.researcher.aresearch(
+            f"Provide a comprehensive summary and key sub-topics for learning: {topic}",
+            owner=owner,
+            cache_key=fold(topic)
+        )
+
+    async def research_topic(self, state: PlannerState, config: RunnableConfig):
+        if state.get('research_summary'):
+            # Already researched speculatively while the intent was being classified
+            get_stream_writer()({"event": "node", "node": "research_topic", "status": "reused"})
+            return {}
         print(f"Researching topic: {state['topic']}")
-        summary = self.researcher.research(f"Provide a comprehensive summary and key sub-topics for learning: {state['topic']}")
+        get_stream_writer()({"event": "node", "node": "research_topic", "status": "started"})
+        summary = await self.research(state['topic'], owner=config['configurable'].get('owner', DEFAULT_OWNER))
         return {"research_summary": summary}
 
-    def generate_roadmap(self, state: PlannerState):
+    async def generate_roadmap(self, state: PlannerState):
         print("Generating roadmap...")
+        writer = get_stream_writer()
+        writer({"event": "node", "node": "generate_roadmap", "status": "started"})
         
         feedback_context = ""
         if state.get('feedback'):
@@ -85,20 +120,51 @@ class PlannerAgent:
         
         Return ONLY the JSON.
         """
-        response = self.llm.complete(prompt)
-        text = response.text
-        
-        # Clean up code blocks if present
-        text = re.sub(r"```json", "", text)
-        text = re.sub(r"```", "", text)
+        # Stream the completion so /agent/run/stream can forward tokens as they arrive.
+        # The writer is a no-op unless the graph runs with stream_mode="custom".
+        chunks = []
+        async for chunk in await self.llm.astream_complete(prompt, **json_mode(self.llm)):
+            if chunk.delta:
+                chunks.append(chunk.delta)
+                writer({"event": "token", "node": "generate_roadmap", "text": chunk.delta})
+        text = "".join(chunks)
+        
+        roadmap = await self.parse_roadmap_or_retry(text)
+            
+        return {"roadmap": roadmap, "feedback": None} # Clear feedback after usage
+
+    async def parse_roadmap_or_retry(self, text: str):
+        # Validate against the RoadmapItem schema, repair locally, and only then spend
+        # one targeted LLM retry instead of making the user re-run the whole plan
+        parse_stats["attempts"] += 1
+        try:
+            return parse_roadmap(text)
+        except RoadmapParseError as e:
+            print(f"Roadmap JSON invalid ({e}); retrying once")
+            parse_stats["retried"] += 1
+            response = await self.llm.acomplete(retry_prompt(text, str(e)), **json_mode(self.llm))
+            try:
+                return parse_roadmap(response.text)
+            except RoadmapParseError:
+                print(f"Failed to parse JSON: {response.text}")
+                parse_stats["failed"] += 1
+                return []
+
+    async def revise_roadmap(self, state: PlannerState):
+        # Incremental revision: the LLM sees only the current plan and the feedback (not the
+        # research summary) and answers with edit/insert/delete ops instead of a whole new plan
+        print("Revising roadmap...")
+        get_stream_writer()({"event": "node", "node": "revise_roadmap", "status": "started"})
+        prompt = revision_prompt(state['topic'], state['hours_per_week'], state['roadmap'], state['feedback'])
+        response = await self.llm.acomplete(prompt, **json_mode(self.llm))
         
         try:
-            roadmap = json.loads(text.strip())
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON: {text}")
-            roadmap = []
+            roadmap = apply_patch(state['roadmap'], parse_patch(response.text))
+        except RoadmapParseError as e:
+            print(f"Could not apply roadmap patch ({e}); regenerating")
+            return await self.generate_roadmap(state)
             
-        return {"roadmap": roadmap, "feedback": None} # Clear feedback after usage
+        return {"roadmap": roadmap, "feedback": None}
 
     def human_approval(self, state: PlannerState):
         # This node is just a placeholder to be interrupted before
@@ -109,60 +175,74 @@ class PlannerAgent:
         if state.get('approved'):
             return "approved"
         elif state.get('feedback'):
-            return "feedback"
+            # Patch an existing plan; only regenerate from scratch when there is nothing to patch
+            return "revise" if state.get('roadmap') else "feedback"
         return "wait"
 
-    def schedule_roadmap(self, state: PlannerState):
+    def scheduling_constraints(self, hours_per_week: int) -> SchedulingConstraints:
+        return SchedulingConstraints(
+            weekly_cap_hours=hours_per_week,
+            max_session_hours=settings.SCHEDULE_MAX_SESSION_HOURS,
+            min_session_hours=settings.SCHEDULE_MIN_SESSION_HOURS,
+            max_hours_per_day=settings.SCHEDULE_MAX_HOURS_PER_DAY,
+            buffer_minutes=settings.SCHEDULE_BUFFER_MINUTES,
+            day_start_hour=settings.SCHEDULE_DAY_START_HOUR,
+            day_end_hour=settings.SCHEDULE_DAY_END_HOUR,
+            preferred_hours=parse_hour_range(settings.SCHEDULE_PREFERRED_HOURS),
+            horizon_days=settings.SCHEDULE_HORIZON_DAYS
+        )
+
+    async def schedule_roadmap(self, state: PlannerState, config: RunnableConfig):
         print("Scheduling roadmap...")
         roadmap = state['roadmap']
-        creds = state['creds']
+        creds = config['configurable']['creds']
+        constraints = self.scheduling_constraints(state['hours_per_week'])
         
-        scheduled_plan = []
         current_date = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        horizon_end = current_date + timedelta(days=constraints.horizon_days)
         
-        # Simple greedy scheduler: find first available slot in next 7 days
-        # Working hours assumed: 9am - 9pm
+        # Fetch busy time for the whole horizon once; all placement then happens in memory.
+        # Calendar client is blocking, so its I/O runs in a worker thread off the event loop
+        busy = await asyncio.to_thread(self.calendar.get_busy_intervals, creds, current_date, horizon_end)
         
-        for item in roadmap:
-            duration = item['duration_hours']
-            topic = item['topic']
-            
-            # Find a slot
-            slot_found = False
-            search_start = current_date
-            
-            while not slot_found:
-                # Check if within working hours (simple check)
-                if search_start.hour < 9:
-                    search_start = search_start.replace(hour=9)
-                if search_start.hour + duration > 21:
-                    # Move to next day
-                    search_start = search_start + timedelta(days=1)
-                    search_start = search_start.replace(hour=9)
-                    continue
-                
-                search_end = search_start + timedelta(hours=duration)
-                
-                if self.calendar.check_availability(creds, search_start, search_end):
-                    # Book it (conceptually, or actually create event if desired)
-                    # For now, we just add to plan
-                    scheduled_plan.append({
-                        "topic": topic,
-                        "start": search_start.isoformat(),
-                        "end": search_end.isoformat()
-                    })
-                    
-                    # Create actual event
-                    self.calendar.create_event(creds, f"Study: {topic}", search_start, search_end)
-                    
-                    slot_found = True
-                    current_date = search_end + timedelta(minutes=15) # Buffer
-                else:
-                    search_start += timedelta(hours=1)
-                    
-                # Safety break to avoid infinite loop
-                if search_start > datetime.now() + timedelta(days=30):
-                    print("Could not find slot within 30 days")
-                    break
+        # Items are split into sessions and placed under the weekly cap (hours_per_week),
+        # daily cap, buffers and preferred hours
+        sessions, unscheduled = SessionScheduler(constraints).schedule(roadmap, busy, current_date)
+        for missing in unscheduled:
+            print(f"Could not find slot for {missing['topic']} session {missing['session']} within {constraints.horizon_days} days")
+        
+        scheduled_plan = []
+        events = []
+        for session in sessions:
+            scheduled_plan.append({
+                "topic": session['topic'],
+                "session": session['session'],
+                "sessions_total": session['sessions_total'],
+                "start": session['start'].isoformat(),
+                "end": session['end'].isoformat()
+            })
+            summary = f"Study: {session['topic']}"
+            if session['sessions_total'] > 1:
+                summary += f" ({session['session']}/{session['sessions_total']})"
+            events.append({
+                "summary": summary,
+                "start": session['start'],
+                "end": session['end'],
+                # Stable per plan, roadmap item and session: a repeated COMMIT finds the events it
+                # already created. The item index keeps repeated topics apart
+                "key": f"{config['configurable'].get('thread_id')}:{session['item']}:{session['topic']}:{session['session']}/{session['sessions_total']}"
+            })
+        
+        # Create all events in one batched round trip
+        results = await asyncio.to_thread(self.calendar.create_events, creds, events) if events else []
+        for entry, result in zip(scheduled_plan, results):
+            entry["event_id"] = result["event_id"]
+            entry["status"] = result["status"]
+            if "start" in result:
+                # Already created by an earlier COMMIT, possibly at a different time
+                entry["start"] = result["start"].isoformat()
+                entry["end"] = result["end"].isoformat()
+            if result["error"]:
+                print(f"Failed to create event for {entry['topic']}: {result['error']}")
                     
         return {"scheduled_plan": scheduled_plan}
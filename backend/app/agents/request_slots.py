@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Literal, Optional
+from pydantic import BaseModel, ValidationError, ValidationInfo, field_validator, model_validator
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import json
+import re
+
+UTC_OFFSET = re.compile(r"^(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+
+def parse_timezone(value: Optional[str]) -> Optional[tzinfo]:
+    """Client timezone as an IANA name ("Europe/Berlin") or a UTC offset ("+02:00", "UTC-5")."""
+    if not value or value.strip().upper() in ("UTC", "GMT", "Z"):
+        return None
+    value = value.strip()
+    match = UTC_OFFSET.match(value)
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        if offset >= timedelta(hours=24):
+            raise ValueError(f"Invalid UTC offset {value!r}")
+        return timezone(-offset if sign == "-" else offset)
+    try:
+        return ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone {value!r}")
+
+
+class RequestSlots(BaseModel):
+    """Intent plus the typed slots each branch needs, from a single orchestration call."""
+    intent: Literal["learn", "schedule", "unknown"] = "unknown"
+    # learn
+    topic: Optional[str] = None
+    hours_per_week: Optional[int] = None
+    # schedule: always naive UTC, like the rest of the app. Times the LLM gives without an
+    # offset are wall-clock times in the client's timezone (validation context "tz"), or UTC
+    # when the client sent none
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    duration_minutes: Optional[int] = None
+    summary: Optional[str] = None
+
+    @field_validator("intent", mode="before")
+    @classmethod
+    def known_intent(cls, value):
+        value = str(value or "").strip().lower()
+        return value if value in ("learn", "schedule") else "unknown"
+
+    @field_validator("hours_per_week", "duration_minutes", mode="before")
+    @classmethod
+    def positive_int_or_none(cls, value):
+        # A bad number should drop that slot, not the whole parse (and with it the intent)
+        try:
+            value = round(float(value))
+        except (TypeError, ValueError):
+            return None
+        return value if value >= 1 else None
+
+    @field_validator("start_time", "end_time", mode="before")
+    @classmethod
+    def to_naive_utc(cls, value, info: ValidationInfo):
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                return None
+        tz = (info.context or {}).get("tz")
+        if isinstance(value, datetime) and value.tzinfo is None and tz is not None:
+            value = value.replace(tzinfo=tz)
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value if isinstance(value, datetime) else None
+
+    @field_validator("topic", "summary")
+    @classmethod
+    def blank_is_none(cls, value):
+        return value.strip() or None if value else None
+
+    @model_validator(mode="after")
+    def fill_times(self):
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            # A reversed or empty range would reach the Calendar API; drop the end like any
+            # other bad slot and let the duration (or the default length) decide it
+            self.end_time = None
+        # Any two of start / end / duration determine the third
+        if self.start_time and not self.end_time and self.duration_minutes:
+            self.end_time = self.start_time + timedelta(minutes=self.duration_minutes)
+        elif self.start_time and self.end_time and not self.duration_minutes:
+            self.duration_minutes = int((self.end_time - self.start_time).total_seconds() // 60)
+        elif self.end_time and not self.start_time and self.duration_minutes:
+            self.start_time = self.end_time - timedelta(minutes=self.duration_minutes)
+        return self
+
+
+def slots_prompt(input_text: str, now: datetime, tz_name: str = "UTC") -> str:
+    # `now` is the client's local wall-clock time in `tz_name`
+    return f"""
+    Classify the user input and extract its parameters.
+    Intents:
+    - "learn": User wants to learn a topic, study something, or create a roadmap.
+    - "schedule": User wants to check availability or schedule a specific meeting.
+    - "unknown": Anything else.
+
+    Current time ({tz_name}): {now.strftime('%Y-%m-%dT%H:%M')} ({now.strftime('%A')})
+    Input: "{input_text}"
+
+    Return ONLY a JSON object with these keys (null when not stated):
+    - "intent": "learn" | "schedule" | "unknown"
+    - "topic": string, the subject to learn (learn only)
+    - "hours_per_week": integer, study hours per week (learn only)
+    - "start_time": ISO 8601 datetime "YYYY-MM-DDTHH:MM" in the same timezone as the current time, resolved against it (schedule only)
+    - "end_time": ISO 8601 datetime (schedule only)
+    - "duration_minutes": integer (schedule only)
+    - "summary": short event title (schedule only)
+    """
+
+
+def parse_slots(text: str, tz: Optional[tzinfo] = None) -> RequestSlots:
+    """
+    Validated slots from the LLM answer; anything unparseable degrades to intent "unknown".
+    Times without an offset are read as local to `tz` (UTC if None) and converted to naive UTC.
+    """
+    candidates = [text]
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(re.sub(r",\s*}", "}", text[start:end + 1]))
+    for candidate in candidates:
+        try:
+            return RequestSlots.model_validate(json.loads(candidate), context={"tz": tz})
+        except (json.JSONDecodeError, ValidationError):
+            continue
+    # Plain intent strings still classify, just without slots
+    return RequestSlots(intent=text.strip().strip('"'))
@@ -0,0 +1,164 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+import json
+import math
+import re
+
+
+class RoadmapItem(BaseModel):
+    topic: str = Field(min_length=1)
+    duration_hours: int = Field(ge=1)
+
+    @field_validator("duration_hours", mode="before")
+    @classmethod
+    def round_up_hours(cls, value):
+        # Models sometimes answer 1.5 hours; schedule whole hours rather than reject the plan
+        if isinstance(value, float):
+            return math.ceil(value)
+        return value
+
+
+Roadmap = TypeAdapter(List[RoadmapItem])
+
+# Gemini JSON mode
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+
+def json_mode(llm) -> dict:
+    """
+    Completion kwargs asking `llm` for JSON output. llama_index forwards extra kwargs to the
+    provider call and only Gemini accepts generation_config (OpenAI, for one, rejects it), so
+    other LLMs get none and rely on the prompt and the parser's repair / retry.
+    """
+    from llama_index.llms.gemini import Gemini
+    return {"generation_config": JSON_GENERATION_CONFIG} if isinstance(llm, Gemini) else {}
+
+# Parse outcomes across all roadmap generations, to track the failure rate
+parse_stats = {"attempts": 0, "parsed": 0, "repaired": 0, "retried": 0, "failed": 0}
+
+
+class RoadmapParseError(ValueError):
+    pass
+
+
+def roadmap_parse_stats() -> dict:
+    attempts = parse_stats["attempts"]
+    return {**parse_stats, "failure_rate": parse_stats["failed"] / attempts if attempts else 0.0}
+
+
+def _validate(data) -> List[dict]:
+    if isinstance(data, dict):
+        # Tolerate {"roadmap": [...]} style wrappers
+        data = next((v for v in data.values() if isinstance(v, list)), data)
+    return [item.model_dump() for item in Roadmap.validate_python(data)]
+
+
+def repair_json(text: str) -> str:
+    """Cheap local fixes for the usual LLM JSON mistakes."""
+    text = re.sub(r"```(?:json)?", "", text)
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    # Trailing commas before a closing bracket or brace
+    text = re.sub(r",\s*([\]}])", r"\1", text)
+    return text.strip()
+
+
+def parse_roadmap(text: str) -> List[dict]:
+    """Strict parse first, then a local repair pass. Raises RoadmapParseError if both fail."""
+    try:
+        result = _validate(json.loads(text))
+        parse_stats["parsed"] += 1
+        return result
+    except (json.JSONDecodeError, ValidationError):
+        pass
+
+    try:
+        result = _validate(json.loads(repair_json(text)))
+        parse_stats["repaired"] += 1
+        return result
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise RoadmapParseError(str(e)) from e
+
+
+def retry_prompt(text: str, error: str) -> str:
+    return f"""
+    Your previous answer could not be parsed as a study roadmap.
+    Error: {error}
+    
+    Previous answer:
+    {text[:4000]}
+    
+    Return ONLY a corrected JSON list of objects with "topic" (non-empty string)
+    and "duration_hours" (integer >= 1). No prose, no code fences.
+    """
+
+
+class RoadmapPatchOp(BaseModel):
+    op: Literal["edit", "insert", "delete"]
+    # Position in the current roadmap; inserts go before it (== len(roadmap) appends)
+    index: int = Field(ge=0)
+    item: Optional[RoadmapItem] = None
+
+
+RoadmapPatch = TypeAdapter(List[RoadmapPatchOp])
+
+
+def parse_patch(text: str) -> List[RoadmapPatchOp]:
+    for candidate in (text, repair_json(text)):
+        try:
+            data = json.loads(candidate)
+            if isinstance(data, dict):
+                data = next((v for v in data.values() if isinstance(v, list)), data)
+            return RoadmapPatch.validate_python(data)
+        except (json.JSONDecodeError, ValidationError) as e:
+            error = e
+    raise RoadmapParseError(str(error))
+
+
+def apply_patch(roadmap: List[dict], ops: List[RoadmapPatchOp]) -> List[dict]:
+    """
+    Applies edit/insert/delete ops whose indexes all refer to the roadmap as it was
+    before the patch, so the order of ops in the LLM answer does not matter.
+    """
+    edits, deletes, inserts = {}, set(), {}
+    for op in ops:
+        if op.op == "insert":
+            if op.item is None or op.index > len(roadmap):
+                raise RoadmapParseError(f"invalid insert at {op.index}")
+            inserts.setdefault(op.index, []).append(op.item.model_dump())
+        elif op.index >= len(roadmap):
+            raise RoadmapParseError(f"{op.op} index {op.index} out of range")
+        elif op.op == "delete":
+            deletes.add(op.index)
+        else:
+            if op.item is None:
+                raise RoadmapParseError(f"edit at {op.index} has no item")
+            edits[op.index] = op.item.model_dump()
+
+    revised = []
+    for i in range(len(roadmap) + 1):
+        revised.extend(inserts.get(i, []))
+        if i < len(roadmap) and i not in deletes:
+            revised.append(edits.get(i, roadmap[i]))
+    return revised
+
+
+def revision_prompt(topic: str, hours_per_week: int, roadmap: List[dict], feedback: str) -> str:
+    current = "\n".join(
+        f"{i}. {item['topic']} ({item['duration_hours']}h)" for i, item in enumerate(roadmap)
+    )
+    return f"""
+    You are revising an existing study roadmap for '{topic}' ({hours_per_week} hours per week).
+    
+    Current roadmap (index. topic (hours)):
+    {current}
+    
+    USER FEEDBACK: {feedback}
+    
+    Return ONLY a JSON list of patch operations against the current roadmap indexes:
+    - {{"op": "edit", "index": i, "item": {{"topic": str, "duration_hours": int}}}}
+    - {{"op": "insert", "index": i, "item": {{"topic": str, "duration_hours": int}}}} (inserted before index i; use {len(roadmap)} to append)
+    - {{"op": "delete", "index": i}}
+    Only include items that change. Return [] if nothing needs to change.
+    """
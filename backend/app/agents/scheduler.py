@@ -1,7 +1,11 @@
 from typing import TypedDict, Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone, tzinfo
 from langgraph.graph import StateGraph, END
 from app.tools.google_calendar import GoogleCalendarTool
+from app.core.availability import BusyIndex, rank_slots
+from app.core.config import settings
+from app.core.session_scheduler import parse_hour_range
+from app.core.telemetry import traced
 from google.oauth2.credentials import Credentials
 
 class SchedulerState(TypedDict):
@@ -12,14 +16,24 @@ class SchedulerState(TypedDict):
     conflict: bool
     suggested_slots: List[tuple[datetime, datetime]]
     message: str
+    timezone: Optional[tzinfo] # client timezone, None for UTC
+    busy: List[tuple[datetime, datetime]] # freeBusy over the search window, naive UTC
+
+def to_local(value: datetime, tz: Optional[tzinfo]) -> datetime:
+    # Naive UTC -> naive wall-clock time in `tz`
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None) if tz else value
+
+def to_utc(value: datetime, tz: Optional[tzinfo]) -> datetime:
+    # Naive wall-clock time in `tz` -> naive UTC
+    return value.replace(tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None) if tz else value
 
 class SchedulerAgent:
     def __init__(self):
         self.calendar_tool = GoogleCalendarTool()
         self.workflow = StateGraph(SchedulerState)
         
-        self.workflow.add_node("check_conflicts", self.check_conflicts)
-        self.workflow.add_node("suggest_slots", self.suggest_slots)
+        self.workflow.add_node("check_conflicts", traced("node", "scheduler.check_conflicts")(self.check_conflicts))
+        self.workflow.add_node("suggest_slots", traced("node", "scheduler.suggest_slots")(self.suggest_slots))
         
         self.workflow.set_entry_point("check_conflicts")
         
@@ -35,17 +49,31 @@ class SchedulerAgent:
         
         self.app = self.workflow.compile()
 
+    @staticmethod
+    def search_window(state: SchedulerState):
+        # Local wall-clock bounds of the suggestion search: the requested day (but not the
+        # past) through SUGGEST_HORIZON_DAYS later
+        tz = state.get('timezone')
+        original_start = to_local(state['start_time'], tz)
+        window_start = max(to_local(datetime.now(timezone.utc).replace(tzinfo=None), tz), original_start.replace(hour=0, minute=0, second=0, microsecond=0))
+        window_end = original_start + timedelta(days=settings.SUGGEST_HORIZON_DAYS)
+        return window_start, window_end
+
     def check_conflicts(self, state: SchedulerState):
+        # One freeBusy fetch covers the requested slot and the whole suggestion window, so the
+        # conflict check and the suggestions agree on what is busy (e.g. "free"/transparent
+        # events count in neither) and suggest_slots needs no second call
         creds = state['creds']
         start = state['start_time']
         end = state['end_time']
+        tz = state.get('timezone')
+        window_start, window_end = self.search_window(state)
+        busy = self.calendar_tool.get_busy_intervals(creds, min(start, to_utc(window_start, tz)), max(end, to_utc(window_end, tz)))
         
-        is_available = self.calendar_tool.check_availability(creds, start, end)
-        
-        if is_available:
-            return {"conflict": False, "message": "Time slot is available."}
+        if BusyIndex(busy).is_free(start, end):
+            return {"conflict": False, "message": "Time slot is available.", "busy": busy}
         else:
-            return {"conflict": True, "message": "Conflict detected."}
+            return {"conflict": True, "message": "Conflict detected.", "busy": busy}
 
     def should_suggest(self, state: SchedulerState):
         if state['conflict']:
@@ -53,24 +81,32 @@ class SchedulerAgent:
         return "end"
 
     def suggest_slots(self, state: SchedulerState):
-        # Simple logic: suggest the next available 1-hour slot after the conflict
-        # In a real scenario, this would be more complex (checking multiple days, user preferences)
-        creds = state['creds']
-        original_start = state['start_time']
+        # Alternatives are ranked in memory over the busy intervals check_conflicts fetched,
+        # by proximity to the requested time, inside working hours (preferred hours first).
+        # State times are naive UTC; working hours and the message are in the client's timezone
+        tz = state.get('timezone')
+        original_start = to_local(state['start_time'], tz)
         duration = state['end_time'] - state['start_time']
         
-        suggested = []
-        # Check next 3 hours
-        for i in range(1, 4):
-            new_start = original_start + timedelta(hours=i)
-            new_end = new_start + duration
-            if self.calendar_tool.check_availability(creds, new_start, new_end):
-                suggested.append((new_start, new_end))
-                break # Just find the first one for now
+        # Earlier slots on the requested day are fine as long as they are not in the past
+        window_start, window_end = self.search_window(state)
+        
+        suggested = rank_slots(
+            BusyIndex((to_local(s, tz), to_local(e, tz)) for s, e in state['busy']),
+            original_start,
+            duration,
+            window_start,
+            window_end,
+            limit=settings.SUGGEST_MAX_SLOTS,
+            day_start_hour=settings.SCHEDULE_DAY_START_HOUR,
+            day_end_hour=settings.SCHEDULE_DAY_END_HOUR,
+            preferred_hours=parse_hour_range(settings.SCHEDULE_PREFERRED_HOURS)
+        )
         
         if suggested:
-            msg = f"Conflict detected. Suggested alternative: {suggested[0][0].strftime('%H:%M')} - {suggested[0][1].strftime('%H:%M')}"
+            options = ", ".join(f"{s.strftime('%a %H:%M')} - {e.strftime('%H:%M')}" for s, e in suggested)
+            msg = f"Conflict detected. Suggested alternatives ({tz or 'UTC'}): {options}"
         else:
-            msg = "Conflict detected. No immediate alternatives found."
+            msg = f"Conflict detected. No free slot found in the next {settings.SUGGEST_HORIZON_DAYS} days."
             
-        return {"suggested_slots": suggested, "message": msg}
+        return {"suggested_slots": [(to_utc(s, tz), to_utc(e, tz)) for s, e in suggested], "message": msg}
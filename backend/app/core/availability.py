@@ -0,0 +1,173 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+def parse_rfc3339(value: str) -> datetime:
+    # Calendar returns RFC3339 timestamps; the rest of the app works in naive UTC
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class BusyIndex:
+    """
+    Sorted, merged set of busy intervals answering availability queries in memory.
+    Built once from a single free/busy fetch so slot searches cost no API calls.
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        for start, end in self._merge(sorted(intervals)):
+            self._starts.append(start)
+            self._ends.append(end)
+
+    @staticmethod
+    def _merge(intervals: List[Interval]) -> List[Interval]:
+        merged: List[Interval] = []
+        for start, end in intervals:
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def __len__(self):
+        return len(self._starts)
+
+    def intervals(self) -> List[Interval]:
+        return list(zip(self._starts, self._ends))
+
+    def _first_overlapping(self, start: datetime) -> int:
+        # Index of the first busy interval that ends after `start`
+        i = bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] > start:
+            return i
+        return i + 1
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        i = self._first_overlapping(start)
+        return i >= len(self._starts) or self._starts[i] >= end
+
+    def add(self, start: datetime, end: datetime):
+        """Marks [start, end) as busy, e.g. after booking a slot."""
+        if end <= start:
+            return
+        i = bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] >= start:
+            start = self._starts[i]
+        else:
+            i += 1
+        j = i
+        while j < len(self._starts) and self._starts[j] <= end:
+            end = max(end, self._ends[j])
+            j += 1
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+    def free_intervals(self, start: datetime, end: datetime) -> List[Interval]:
+        """Complement of the busy set within [start, end)."""
+        free: List[Interval] = []
+        cursor = start
+        i = self._first_overlapping(start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._starts[i] > cursor:
+                free.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if cursor < end:
+            free.append((cursor, end))
+        return free
+
+    def next_free_slot(
+        self,
+        start: datetime,
+        duration: timedelta,
+        day_start_hour: int = 9,
+        day_end_hour: int = 21,
+        until: Optional[datetime] = None,
+    ) -> Optional[Interval]:
+        """
+        Earliest slot of `duration` starting at or after `start` that fits inside the
+        daily working window and does not overlap any busy interval.
+        """
+        window = timedelta(hours=day_end_hour - day_start_hour)
+        if duration > window:
+            return None
+
+        candidate = start
+        i = self._first_overlapping(candidate)
+        while until is None or candidate + duration <= until:
+            day_open = candidate.replace(hour=day_start_hour, minute=0, second=0, microsecond=0)
+            day_close = day_open + window
+            if candidate < day_open:
+                candidate = day_open
+            if candidate + duration > day_close:
+                candidate = day_open + timedelta(days=1)
+                continue
+
+            # Skip busy intervals that end before the candidate; the cursor only moves forward
+            while i < len(self._starts) and self._ends[i] <= candidate:
+                i += 1
+            if i < len(self._starts) and self._starts[i] < candidate + duration:
+                candidate = max(candidate, self._ends[i])
+                continue
+            return candidate, candidate + duration
+        return None
+
+
+def rank_slots(
+    index: BusyIndex,
+    requested: datetime,
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+    limit: int = 5,
+    day_start_hour: int = 9,
+    day_end_hour: int = 21,
+    preferred_hours: Optional[Tuple[int, int]] = None,
+    step: timedelta = timedelta(minutes=30),
+) -> List[Interval]:
+    """
+    Top `limit` non-overlapping free slots of `duration` within [window_start, window_end),
+    ranked by distance from `requested`. Slots stay inside the daily working window; slots
+    inside `preferred_hours` rank as if they were an hour closer.
+    """
+    candidates = []
+    day = window_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < window_end:
+        day_open = max(day + timedelta(hours=day_start_hour), window_start)
+        day_close = min(day + timedelta(hours=day_end_hour), window_end)
+        for free_start, free_end in index.free_intervals(day_open, day_close) if day_open < day_close else []:
+            # Offer the requested time-of-day grid plus the start of each free gap
+            offset = (free_start - requested) % step
+            starts = {free_start}
+            start = free_start + (step - offset if offset else timedelta(0))
+            while start + duration <= free_end:
+                starts.add(start)
+                start += step
+            for start in starts:
+                if start + duration > free_end:
+                    continue
+                score = abs((start - requested).total_seconds()) / 3600
+                if preferred_hours and day + timedelta(hours=preferred_hours[0]) <= start \
+                        and start + duration <= day + timedelta(hours=preferred_hours[1]):
+                    score -= 1
+                candidates.append((score, start))
+        day += timedelta(days=1)
+
+    picked: List[Interval] = []
+    for _, start in sorted(candidates):
+        end = start + duration
+        if all(end <= s or start >= e for s, e in picked):
+            picked.append((start, end))
+            if len(picked) == limit:
+                break
+    return picked
@@ -0,0 +1,122 @@
+from contextlib import AsyncExitStack
+from app.core.config import settings
+import asyncio
+import os
+import time
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+
+
+class CheckpointStore:
+    """
+    Owns the LangGraph checkpointer for paused planner threads and evicts abandoned ones.
+
+    - "sqlite": AsyncSqliteSaver on a file shared by every worker process (default)
+    - "redis": AsyncRedisSaver; eviction uses Redis' native key TTLs
+    - "memory": MemorySaver, single process only (tests / benchmarks)
+
+    Thread state never contains Google credentials; callers pass them per request
+    through config["configurable"]["creds"], so checkpoints serialize compactly.
+    """
+
+    def __init__(self, backend: str = None, ttl_minutes: int = None):
+        self.backend = (backend or settings.CHECKPOINTER_BACKEND).lower()
+        self.ttl_seconds = (ttl_minutes or settings.CHECKPOINT_TTL_MINUTES) * 60
+        self._saver = None
+        if self.backend == "memory":
+            from langgraph.checkpoint.memory import MemorySaver
+
+            self._saver = MemorySaver()
+        self._last_seen = {}
+        self._stack = AsyncExitStack()
+        self._janitor = None
+
+    @property
+    def saver(self):
+        if self._saver is None:
+            raise RuntimeError(f"{self.backend} checkpointer is not set up; await CheckpointStore.setup() first")
+        return self._saver
+
+    async def setup(self):
+        if self._saver is None:
+            if self.backend == "sqlite":
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+                path = settings.CHECKPOINT_DB_PATH or os.path.join(DATA_DIR, "checkpoints.sqlite3")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._saver = await self._stack.enter_async_context(AsyncSqliteSaver.from_conn_string(path))
+                await self._saver.setup()
+                await self._saver.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+                )
+                await self._saver.conn.commit()
+            elif self.backend == "redis":
+                from langgraph.checkpoint.redis.aio import AsyncRedisSaver
+
+                ttl = {"default_ttl": self.ttl_seconds // 60, "refresh_on_read": True}
+                self._saver = await self._stack.enter_async_context(
+                    AsyncRedisSaver.from_conn_string(settings.REDIS_URL, ttl=ttl)
+                )
+                await self._saver.asetup()
+            else:
+                raise ValueError(f"Unknown checkpointer backend: {self.backend}")
+
+        if self.backend != "redis" and self._janitor is None:
+            self._janitor = asyncio.create_task(self._prune_periodically())
+
+    async def close(self):
+        if self._janitor is not None:
+            self._janitor.cancel()
+            self._janitor = None
+        await self._stack.aclose()
+        if self.backend != "memory":
+            self._saver = None
+
+    async def touch(self, thread_id: str):
+        """Records activity on a thread so it is not evicted."""
+        now = time.time()
+        if self.backend == "sqlite":
+            await self.saver.conn.execute(
+                "INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (thread_id, now),
+            )
+            await self.saver.conn.commit()
+        elif self.backend == "memory":
+            self._last_seen[thread_id] = now
+
+    async def delete(self, thread_id: str):
+        await self.saver.adelete_thread(thread_id)
+        if self.backend == "sqlite":
+            await self.saver.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+            await self.saver.conn.commit()
+        else:
+            self._last_seen.pop(thread_id, None)
+
+    async def prune(self):
+        """Deletes every thread idle for longer than the TTL. Returns how many were evicted."""
+        cutoff = time.time() - self.ttl_seconds
+        if self.backend == "sqlite":
+            async with self.saver.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,)
+            ) as cursor:
+                expired = [row[0] for row in await cursor.fetchall()]
+        elif self.backend == "memory":
+            expired = [tid for tid, seen in self._last_seen.items() if seen < cutoff]
+        else:
+            return 0
+
+        for thread_id in expired:
+            await self.delete(thread_id)
+        if expired:
+            print(f"Evicted {len(expired)} idle planner threads")
+        return len(expired)
+
+    async def _prune_periodically(self):
+        interval = max(60, min(self.ttl_seconds // 4, 3600))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                print(f"Checkpoint pruning failed: {e}")
@@ -1,5 +1,8 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Knowledge-base namespace for unauthenticated uploads and dev credentials
+DEFAULT_OWNER = "default"
+
 class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
@@ -7,6 +10,76 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str
     GOOGLE_API_KEY: str | None = None
 
+    # "lazy", "background" or "eager" construction of agents and the vector store
+    STARTUP_MODE: str = "background"
+
+    # Planner thread checkpoints: "sqlite" (default), "redis" or "memory"
+    CHECKPOINTER_BACKEND: str = "sqlite"
+    CHECKPOINT_DB_PATH: str | None = None
+    REDIS_URL: str = "redis://localhost:6379"
+    # Paused planner threads untouched for this long are evicted
+    CHECKPOINT_TTL_MINUTES: int = 24 * 60
+
+    # Intent classification tiers
+    INTENT_CACHE_SIZE: int = 1024
+    INTENT_EMBEDDINGS_ENABLED: bool = False
+    INTENT_EMBEDDING_THRESHOLD: float = 0.85
+
+    # Semantic cache in front of ResearcherTool, keyed on the bare topic. Tune the threshold per
+    # embedding model with benchmarks/calibrate_research_cache.py
+    RESEARCH_CACHE_SIZE: int = 256
+    RESEARCH_CACHE_TTL_SECONDS: int = 3600
+    RESEARCH_CACHE_THRESHOLD: float = 0.95
+
+    # Hybrid retrieval: dense + BM25 candidates, fused, reranked and trimmed before synthesis
+    RETRIEVAL_VECTOR_TOP_K: int = 10
+    RETRIEVAL_BM25_TOP_K: int = 10
+    RETRIEVAL_RRF_K: int = 60
+    RERANK_TOP_N: int = 5
+    CONTEXT_TOKEN_BUDGET: int = 2000
+
+    # Nodes embedded and upserted per batch during PDF ingestion
+    INGEST_BATCH_SIZE: int = 256
+    # Background ingestion threads and the cap on queued + running uploads, both per worker
+    # process. Job status is kept in data/ingestion_jobs.sqlite3, visible to every worker
+    INGEST_WORKERS: int = 2
+    INGEST_MAX_PENDING: int = 16
+
+    # Study-session scheduling
+    SCHEDULE_MAX_SESSION_HOURS: float = 2
+    SCHEDULE_MIN_SESSION_HOURS: float = 1
+    SCHEDULE_MAX_HOURS_PER_DAY: float = 4
+    SCHEDULE_BUFFER_MINUTES: int = 15
+    SCHEDULE_DAY_START_HOUR: int = 9
+    SCHEDULE_DAY_END_HOUR: int = 21
+    # Optional "start-end" hours tried first each day, e.g. "18-21"
+    SCHEDULE_PREFERRED_HOURS: str | None = None
+    SCHEDULE_HORIZON_DAYS: int = 120
+    # Conflict alternatives: days searched after the requested time and how many to return
+    SUGGEST_HORIZON_DAYS: int = 7
+    SUGGEST_MAX_SLOTS: int = 5
+
+    # Start topic research alongside intent classification; wasted (and cancelled) for non-"learn" requests
+    SPECULATIVE_RESEARCH: bool = False
+
+    # Tracing: per-request summary lines in the log, and OpenTelemetry spans (needs opentelemetry-api)
+    TRACE_REQUESTS: bool = True
+    OTEL_ENABLED: bool = False
+
+    # Embedding backend: "gemini" (API), "fastembed" (local ONNX) or "huggingface" (local
+    # sentence-transformers). Local backends need llama-index-embeddings-fastembed or
+    # llama-index-embeddings-huggingface. Changing the model requires re-embedding the
+    # knowledge base: python -m app.core.reembed
+    EMBEDDING_BACKEND: str = "gemini"
+    EMBEDDING_MODEL: str | None = None
+    # CPU threads for local inference (None: library default)
+    EMBEDDING_THREADS: int | None = None
+
+    # Embedding API batching, concurrency and rate-limit retries
+    EMBED_BATCH_SIZE: int = 32
+    EMBED_MAX_CONCURRENCY: int = 4
+    EMBED_MAX_RETRIES: int = 5
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 settings = Settings()
@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from typing import Dict, List
+from app.core.config import settings
+from app.core.manifest import DATA_DIR, sha256_text
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+# Model used when EMBEDDING_MODEL is unset; the id is also what collections and the cache are tagged with
+DEFAULT_EMBEDDING_MODELS = {
+    "gemini": "models/embedding-001",
+    "fastembed": "BAAI/bge-small-en-v1.5",
+    "huggingface": "BAAI/bge-small-en-v1.5",
+}
+
+
+def embedding_model_id(backend: str = None, model_name: str = None) -> str:
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend not in DEFAULT_EMBEDDING_MODELS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(DEFAULT_EMBEDDING_MODELS)}")
+    if model_name is None and backend == settings.EMBEDDING_BACKEND:
+        model_name = settings.EMBEDDING_MODEL
+    return model_name or DEFAULT_EMBEDDING_MODELS[backend]
+
+
+def build_embed_model(backend: str = None, model_name: str = None):
+    """
+    Embedding model for the configured backend. Local backends run on CPU with batched,
+    vectorized inference (ONNX Runtime for fastembed, PyTorch for huggingface), so
+    ingestion is bound by local cores rather than API quotas. Their packages are optional
+    and only imported here.
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    model_name = embedding_model_id(backend, model_name)
+    # get_text_embedding_batch re-splits every call by the model's own embed_batch_size
+    # (10 by default), so it has to match the batches BatchEmbedder sends
+    batch_size = settings.EMBED_BATCH_SIZE
+    if backend == "fastembed":
+        from llama_index.embeddings.fastembed import FastEmbedEmbedding
+        return FastEmbedEmbedding(model_name=model_name, threads=settings.EMBEDDING_THREADS, embed_batch_size=batch_size)
+    if backend == "huggingface":
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        if settings.EMBEDDING_THREADS:
+            import torch
+            torch.set_num_threads(settings.EMBEDDING_THREADS)
+        return HuggingFaceEmbedding(model_name=model_name, device="cpu", embed_batch_size=batch_size)
+    from llama_index.embeddings.gemini import GeminiEmbedding
+    return GeminiEmbedding(model_name=model_name, api_key=os.getenv("GEMINI_API_KEY"), embed_batch_size=batch_size)
+
+
+class EmbeddingCache:
+    """On-disk cache of embeddings keyed by (model id, sha256 of the text)."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(DATA_DIR, "embedding_cache.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(text_hashes), 500):
+                chunk = text_hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, array("f", vector).tobytes()) for text_hash, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if status in (429, 503):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted", "rate limit", "quota", "503", "unavailable"))
+
+
+class BatchEmbedder:
+    """
+    Wraps an embedding model with caching, fixed-size batches, bounded concurrency
+    and exponential backoff (with jitter) on rate-limit errors.
+    """
+
+    def __init__(
+        self,
+        embed_model,
+        cache: EmbeddingCache = None,
+        batch_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+    ):
+        self.embed_model = embed_model
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.EMBED_MAX_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else settings.EMBED_MAX_RETRIES
+        self.model_id = getattr(embed_model, "model_name", None) or type(embed_model).__name__
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embed_model.get_text_embedding_batch(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                print(f"Embedding rate limited ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        hashes = [sha256_text(text) for text in texts]
+        vectors = self.cache.get_many(self.model_id, list(set(hashes)))
+
+        # Each distinct uncached text is embedded once, even if it repeats in the input
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        self.cache_hits += len(texts) - len(missing)
+        self.cache_misses += len(missing)
+
+        if missing:
+            keys = list(missing)
+            batches = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = pool.map(lambda batch: self._embed_batch([missing[k] for k in batch]), batches)
+                for batch, embeddings in zip(batches, results):
+                    fresh = dict(zip(batch, embeddings))
+                    self.cache.put_many(self.model_id, fresh)
+                    vectors.update(fresh)
+
+        return [vectors[text_hash] for text_hash in hashes]
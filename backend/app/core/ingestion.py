@@ -1,37 +1,170 @@
-from llama_index.core import SimpleDirectoryReader
 from llama_index.core.node_parser import TokenTextSplitter
-from llama_index.core import VectorStoreIndex, StorageContext
-from app.core.vector_store import get_vector_store, setup_embeddings
+from llama_index.core import Document, StorageContext
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from app.core.vector_store import DEFAULT_OWNER, get_vector_store, setup_embeddings, mark_collection_updated
+from app.core.manifest import DocumentManifest, sha256_file, sha256_text
+from app.core.embeddings import BatchEmbedder
+from app.core.config import settings
 from llama_index.core import Settings
+from pypdf import PdfReader
+from typing import Callable, Optional
+import os
+
+# on_progress(pages_done, total_pages, chunks_written)
+ProgressCallback = Callable[[int, int, int], None]
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, batch_size: int = None, manifest: DocumentManifest = None):
         setup_embeddings()
         self.vector_store = get_vector_store()
         self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
         # 512 token chunk size, 10% overlap (approx 51 tokens)
         self.text_splitter = TokenTextSplitter(chunk_size=512, chunk_overlap=51)
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.manifest = manifest or DocumentManifest()
+        self.embedder = BatchEmbedder(Settings.embedding_model)
+
+    def iter_pages(self, reader: PdfReader, file_name: str, owner: str = DEFAULT_OWNER):
+        # One Document per page, parsed lazily so only the current page is held in memory.
+        # Metadata mirrors what SimpleDirectoryReader used to attach.
+        labels = reader.page_labels
+        for i, page in enumerate(reader.pages):
+            label = labels[i] if i < len(labels) else str(i + 1)
+            yield Document(
+                text=page.extract_text() or "",
+                doc_id=sha256_text(file_name, label)[:32],
+                metadata={"file_name": file_name, "page_label": label, "owner": owner},
+                # Embed the chunk text alone so identical chunks share cached embeddings,
+                # also across owners, renamed files and pages that moved
+                excluded_embed_metadata_keys=["owner", "file_name", "page_label"],
+                excluded_llm_metadata_keys=["owner"]
+            )
+
+    def split_page(self, document: Document, page_key: str):
+        # Chunk ids hash the page content, not its position, so an unchanged page keeps
+        # its chunk ids when pages are inserted or removed before it
+        nodes = self.text_splitter.get_nodes_from_documents([document])
+        seen = {}
+        for node in nodes:
+            chunk_id = sha256_text(document.metadata["file_name"], page_key, node.get_content())[:32]
+            # Identical chunks on one page still need distinct ids
+            seen[chunk_id] = seen.get(chunk_id, -1) + 1
+            node.id_ = chunk_id if seen[chunk_id] == 0 else f"{chunk_id}-{seen[chunk_id]}"
+        return nodes
+
+    def embed_and_upsert(self, nodes, vector_store=None):
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = self.embedder.embed_texts(texts)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        (vector_store or self.vector_store).add(nodes)
+
+    def relabel_chunks(self, nodes, vector_store=None):
+        # Metadata in the same form ChromaVectorStore.add writes it; ids and embeddings are unchanged
+        metadatas = []
+        for node in nodes:
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+            metadatas.append({k: "" if v is None else v for k, v in metadata.items()})
+        (vector_store or self.vector_store).client.update(ids=[node.id_ for node in nodes], metadatas=metadatas)
+
+    def delete_chunks(self, chunk_ids, vector_store=None):
+        if chunk_ids:
+            (vector_store or self.vector_store).delete_nodes(node_ids=list(chunk_ids))
+
+    def process_pdf(
+        self,
+        file_path: str,
+        file_name: str = None,
+        owner: str = DEFAULT_OWNER,
+        on_progress: Optional[ProgressCallback] = None
+    ):
+        """
+        Streams a PDF through parse -> split -> embed -> upsert one page at a time.
+        At most one page plus one embedding batch of nodes is in memory, whatever the document size.
+
+        Re-uploads are incremental against the document manifest: an identical file is skipped,
+        pages are matched by content hash so unchanged pages are not re-embedded wherever they
+        moved, changed pages are replaced and pages that disappeared are deleted. Chunks go to
+        the owner's own collection.
+        Returns the number of chunks written.
+        """
+        file_name = file_name or os.path.basename(file_path)
+        # Default-namespace documents keep their original manifest keys
+        doc_key = file_name if owner == DEFAULT_OWNER else f"{owner}/{file_name}"
+        with self.manifest.lock_for(doc_key):
+            return self._process_pdf(file_path, file_name, owner, doc_key, on_progress)
+
+    def _process_pdf(self, file_path: str, file_name: str, owner: str, doc_key: str, on_progress: Optional[ProgressCallback]):
+        vector_store = get_vector_store(owner)
+        file_hash = sha256_file(file_path)
+        previous = self.manifest.get(doc_key) or {"file_hash": None, "pages": {}}
+
+        reader = PdfReader(file_path)
+        total_pages = len(reader.pages)
+        if previous["file_hash"] == file_hash:
+            print(f"{file_name} is already indexed; skipping")
+            if on_progress:
+                on_progress(total_pages, total_pages, 0)
+            return 0
+
+        old_pages = previous["pages"]
+        pages = {}
+        seen = {}
+        pending = []
+        stale = []
+        written = 0
+        relabelled = 0
+        deleted = 0
+        try:
+            for page_number, document in enumerate(self.iter_pages(reader, file_name, owner), start=1):
+                label = document.metadata["page_label"]
+                page_hash = sha256_text(document.text)
+                # Repeated identical pages (e.g. blank ones) each need their own key
+                seen[page_hash] = seen.get(page_hash, -1) + 1
+                key = page_hash if seen[page_hash] == 0 else f"{page_hash}-{seen[page_hash]}"
+                old_page = old_pages.get(key)
+
+                if old_page and old_page["label"] == label:
+                    pages[key] = old_page
+                else:
+                    nodes = self.split_page(document, key)
+                    pages[key] = {"label": label, "chunk_ids": [node.id_ for node in nodes]}
+                    if old_page and set(old_page["chunk_ids"]) == set(pages[key]["chunk_ids"]):
+                        # Same content under a new page label: the stored chunks and their
+                        # vectors stay, only the metadata is rewritten
+                        self.relabel_chunks(nodes, vector_store)
+                        relabelled += len(nodes)
+                    else:
+                        pending.extend(nodes)
+                        if old_page:
+                            # Deleted at the end, once the replacements are upserted
+                            stale.extend(set(old_page["chunk_ids"]) - set(pages[key]["chunk_ids"]))
+
+                while len(pending) >= self.batch_size:
+                    batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+                    self.embed_and_upsert(batch, vector_store)
+                    written += len(batch)
+                if on_progress:
+                    on_progress(page_number, total_pages, written)
+
+            if pending:
+                self.embed_and_upsert(pending, vector_store)
+                written += len(pending)
+                if on_progress:
+                    on_progress(total_pages, total_pages, written)
+
+            # Pages whose content no longer exists in the new revision
+            for key in old_pages.keys() - pages.keys():
+                stale.extend(old_pages[key]["chunk_ids"])
+            self.delete_chunks(stale, vector_store)
+            deleted += len(stale)
+
+            self.manifest.put(doc_key, file_hash, pages)
+        finally:
+            # Even a partial ingest changed the collection
+            if written or relabelled or deleted:
+                mark_collection_updated(owner)
 
-    def process_pdf(self, file_path: str):
-        # Load document
-        # SimpleDirectoryReader is robust for loading single files too
-        reader = SimpleDirectoryReader(input_files=[file_path])
-        documents = reader.load_data()
-
-        # Add metadata (filename is usually added by reader, but we ensure page info)
-        # SimpleDirectoryReader adds 'file_name' and 'page_label' by default.
-        
-        # Parse nodes (chunking)
-        nodes = self.text_splitter.get_nodes_from_documents(documents)
-        
-        # Create/Update Index
-        # We use from_documents or insert_nodes. Since we want to persist to the existing store:
-        index = VectorStoreIndex.from_vector_store(
-            self.vector_store,
-            storage_context=self.storage_context,
-            embed_model=Settings.embedding_model
-        )
-        
-        index.insert_nodes(nodes)
-        
-        return len(nodes)
+        print(f"Indexed {file_name}: {written} chunks written, {deleted} deleted")
+        return written
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from app.core.config import settings
+import math
+import re
+
+# High-precision patterns; anything ambiguous falls through to the next tier
+INTENT_RULES = {
+    "learn": re.compile(
+        r"^\s*(?:i\s+(?:want|would\s+like|need|wanna)\s+to\s+(?:learn|study|master|understand|get\s+into)"
+        r"|teach\s+me|help\s+me\s+(?:learn|study|understand)"
+        r"|(?:create|make|build|give\s+me)\s+(?:me\s+)?(?:a\s+)?(?:study|learning)\s+(?:plan|roadmap)"
+        r"|how\s+(?:do|can|should)\s+i\s+learn)\b",
+        re.IGNORECASE,
+    ),
+    "schedule": re.compile(
+        r"\b(?:schedule|book|reschedule|arrange|set\s+up)\b.*\b(?:meeting|call|appointment|event|session)\b"
+        r"|\b(?:am\s+i|are\s+we)\s+(?:free|available|busy)\b"
+        r"|\bcheck\s+(?:my\s+)?(?:availability|calendar|schedule)\b",
+        re.IGNORECASE,
+    ),
+}
+
+
+
+HOURS_PER_WEEK = re.compile(
+    r"[,\s]*(?:\b(?:in|with|at|for|using)\s+)?(\d+)\s*(?:h|hrs?|hours?)\s*(?:per|a|an|each|every|/)\s*week\b",
+    re.IGNORECASE,
+)
+TOPIC_LEAD = re.compile(r"^\s*(?:about|on|for|in|the\s+basics\s+of)\s+", re.IGNORECASE)
+
+
+def extract_hours_per_week(input_text: str) -> Optional[int]:
+    match = HOURS_PER_WEEK.search(input_text)
+    return int(match.group(1)) if match else None
+
+
+def extract_topic(input_text: str) -> str:
+    """
+    Topic of a "learn" request without the request phrasing, e.g.
+    "I want to learn about Rust, 5 hours a week" -> "Rust". Shared by the orchestrator
+    and speculative research so both agree on the topic; compare topics with same_topic.
+    """
+    text = HOURS_PER_WEEK.sub("", input_text)
+    match = INTENT_RULES["learn"].match(text)
+    if match:
+        text = text[match.end():]
+    text = TOPIC_LEAD.sub("", text)
+    return text.strip(" \t.,!?")
+
+
+INTENT_EXAMPLES = {
+    "learn": [
+        "I want to learn Rust",
+        "teach me linear algebra",
+        "create a study plan for machine learning",
+        "help me get better at Spanish",
+        "I'd like to understand how databases work",
+    ],
+    "schedule": [
+        "schedule a meeting tomorrow at 3pm",
+        "am I free on Friday afternoon",
+        "book a call with Sam next week",
+        "check my calendar for Monday",
+        "find time for a 1 hour session",
+    ],
+}
+
+
+def fold(text: str) -> str:
+    # Case and whitespace only: punctuation can be meaningful ("C++" vs "C#" vs "C")
+    return " ".join(text.lower().split())
+
+
+def same_topic(a: Optional[str], b: Optional[str]) -> bool:
+    # The LLM may return the topic with different case, surrounding quotes or sentence
+    # punctuation, or a leading article than extract_topic; those still name the same topic.
+    # Punctuation inside it counts ("C++" is not "C#")
+    def canonical(topic):
+        return re.sub(r"^(?:the|a|an)\s+", "", fold(topic or "").strip(" .,;:!?\"'"))
+    return bool(a and b) and canonical(a) == canonical(b)
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class IntentClassifier:
+    """
+    Tiered intent classification; each tier only runs when the previous one is not confident:
+    1. regex rules (local, microseconds)
+    2. nearest-neighbour over embedded examples (opt-in; only local if the embed model is)
+    3. LRU cache of case-folded input -> result
+    4. the LLM fallback
+
+    By default the result is the intent string. With `resolve_local`, the local tiers only
+    answer when it can build the full result (intent plus slots) from the text; otherwise the
+    input goes on to the cache and the LLM fallback, which should return the same type.
+    `cacheable` keeps results that go stale (e.g. relative times) out of the cache. Extra
+    keyword arguments to classify() are passed through to the LLM fallback.
+    """
+
+    TIERS = ("rules", "embedding", "cache", "llm")
+
+    def __init__(
+        self,
+        llm_fallback: Callable[[str], Awaitable[Any]],
+        embed_model=None,
+        cache_size: int = None,
+        embedding_threshold: float = None,
+        resolve_local: Callable[[str, str], Optional[Any]] = None,
+        cacheable: Callable[[Any], bool] = None,
+    ):
+        self.llm_fallback = llm_fallback
+        self.resolve_local = resolve_local or (lambda intent, text: intent)
+        self.cacheable = cacheable or (lambda result: True)
+        self.embed_model = embed_model
+        self.cache_size = cache_size or settings.INTENT_CACHE_SIZE
+        self.embedding_threshold = embedding_threshold or settings.INTENT_EMBEDDING_THRESHOLD
+        self._cache = OrderedDict()
+        self._examples = None
+        self.hits = {tier: 0 for tier in self.TIERS}
+
+    def stats(self) -> dict:
+        total = sum(self.hits.values())
+        return {
+            "total": total,
+            "hits": dict(self.hits),
+            "hit_ratio": {tier: (count / total if total else 0.0) for tier, count in self.hits.items()},
+        }
+
+    def match_rules(self, text: str) -> Optional[str]:
+        matches = [intent for intent, pattern in INTENT_RULES.items() if pattern.search(text)]
+        return matches[0] if len(matches) == 1 else None
+
+    async def match_embedding(self, text: str) -> Optional[str]:
+        if self.embed_model is None:
+            return None
+        if self._examples is None:
+            labelled = [(intent, ex) for intent, examples in INTENT_EXAMPLES.items() for ex in examples]
+            vectors = await self.embed_model.aget_text_embedding_batch([ex for _, ex in labelled])
+            self._examples = [(intent, vec) for (intent, _), vec in zip(labelled, vectors)]
+
+        query = await self.embed_model.aget_query_embedding(text)
+        best = {}
+        for intent, vec in self._examples:
+            best[intent] = max(best.get(intent, -1.0), _cosine(query, vec))
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)
+        intent, score = ranked[0]
+        # Require a clear margin so near-ties still go to the LLM
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score >= self.embedding_threshold and score - runner_up >= 0.05:
+            return intent
+        return None
+
+    def _remember(self, key: str, result):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def classify(self, text: str, **fallback_kwargs):
+        intent = self.match_rules(text)
+        result = self.resolve_local(intent, text) if intent else None
+        if result is not None:
+            self.hits["rules"] += 1
+            return result
+
+        intent = await self.match_embedding(text)
+        result = self.resolve_local(intent, text) if intent else None
+        if result is not None:
+            self.hits["embedding"] += 1
+            return result
+
+        # Case and whitespace folded only: "get me into C++" and "... C#" need separate entries
+        key = fold(text)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits["cache"] += 1
+            return self._cache[key]
+
+        result = await self.llm_fallback(text, **fallback_kwargs)
+        self.hits["llm"] += 1
+        if self.cacheable(result):
+            self._remember(key, result)
+        return result
@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from typing import Callable, Optional
+from app.core.manifest import DATA_DIR
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    file_name: str
+    path: str
+    owner: str
+    state: str = "queued"  # queued | running | succeeded | failed
+    pages_done: int = 0
+    total_pages: int = 0
+    chunks: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self):
+        queued_for = (self.started_at or time.time()) - self.created_at
+        run_time = None
+        if self.started_at:
+            run_time = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "state": self.state,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "chunks_created": self.chunks,
+            "error": self.error,
+            "timings": {"queued_seconds": round(queued_for, 3), "run_seconds": round(run_time, 3) if run_time is not None else None},
+        }
+
+
+class JobStore:
+    """
+    Ingestion job state in SQLite under the shared data dir, so GET /upload/{job_id} answers
+    from any worker process, not only the one running the job.
+    """
+
+    COLUMNS = tuple(f.name for f in fields(IngestionJob))
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(DATA_DIR, "ingestion_jobs.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, file_name TEXT, path TEXT, owner TEXT, state TEXT, "
+            "pages_done INTEGER, total_pages INTEGER, chunks INTEGER, error TEXT, "
+            "created_at REAL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def put(self, job: IngestionJob):
+        row = asdict(job)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({','.join(self.COLUMNS)}) VALUES ({','.join('?' * len(self.COLUMNS))})",
+                [row[c] for c in self.COLUMNS],
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {','.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return IngestionJob(**dict(zip(self.COLUMNS, row))) if row else None
+
+    def prune(self, max_finished: int):
+        # Forget the oldest finished jobs once too many are retained
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND id NOT IN "
+                "(SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+                (max_finished,),
+            )
+            self._conn.commit()
+
+
+class IngestionQueue:
+    """
+    Runs PDF ingestion on a dedicated, bounded worker pool so uploads return immediately
+    and never occupy the request threadpool that /agent/run relies on.
+    `max_pending` caps queued + running jobs of this process; submit() raises QueueFullError
+    beyond it. Job state is written through to a JobStore shared by every worker process.
+    """
+
+    def __init__(self, process: Callable, max_workers: int = 2, max_pending: int = 16, max_finished: int = 500, store: JobStore = None):
+        self.process = process
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._store = store
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> JobStore:
+        # Opened on first use so importing the app touches no files
+        with self._lock:
+            if self._store is None:
+                self._store = JobStore()
+            return self._store
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return self._active < self.max_pending
+
+    def submit(self, path: str, file_name: str, owner: str) -> IngestionJob:
+        with self._lock:
+            if self._active >= self.max_pending:
+                raise QueueFullError(f"{self._active} ingestion jobs already pending")
+            job = IngestionJob(id=uuid.uuid4().hex, file_name=file_name, path=path, owner=owner)
+            self._active += 1
+        try:
+            self.store.put(job)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.store.get(job_id)
+
+    def _run(self, job: IngestionJob):
+        job.state = "running"
+        job.started_at = time.time()
+        self.store.put(job)
+
+        def on_progress(pages_done, total_pages, chunks):
+            job.pages_done, job.total_pages, job.chunks = pages_done, total_pages, chunks
+            self.store.put(job)
+
+        try:
+            job.chunks = self.process(job.path, file_name=job.file_name, owner=job.owner, on_progress=on_progress)
+            job.state = "succeeded"
+        except Exception as e:
+            print(f"Ingestion job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+            if os.path.exists(job.path):
+                os.remove(job.path)
+            try:
+                self.store.put(job)
+                self.store.prune(self.max_finished)
+            except Exception as e:
+                print(f"Could not record ingestion job {job.id}: {e}")
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class UploadBackpressureMiddleware:
+    """
+    ASGI middleware answering 429 for uploads while the ingestion queue is full. It runs
+    before FastAPI reads the multipart body, so a rejected upload is never spooled to disk.
+    """
+
+    def __init__(self, app, queue: IngestionQueue, path: str = "/upload"):
+        self.app = app
+        self.queue = queue
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == self.path and not self.queue.has_capacity():
+            from starlette.responses import JSONResponse
+            response = JSONResponse(
+                {"detail": "Too many uploads in progress. Try again shortly."},
+                status_code=429,
+                headers={"Retry-After": "30"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,35 @@
+from functools import wraps
+from typing import Callable, TypeVar
+import asyncio
+import threading
+
+T = TypeVar("T")
+_UNSET = object()
+
+
+def lazy(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Turns a zero-argument factory into a thread-safe, build-once getter.
+    Lets heavy components (and their imports) wait until first use or warm-up.
+    """
+    value = _UNSET
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get():
+        nonlocal value
+        if value is _UNSET:
+            with lock:
+                if value is _UNSET:
+                    value = factory()
+        return value
+
+    get.is_loaded = lambda: value is not _UNSET
+    return get
+
+
+async def aresolve(getter: Callable[[], T]) -> T:
+    """Resolves a lazy getter from async code without building on the event loop thread."""
+    if getter.is_loaded():
+        return getter()
+    return await asyncio.to_thread(getter)
@@ -0,0 +1,73 @@
+from collections import defaultdict
+from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+
+
+def sha256_text(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def sha256_file(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DocumentManifest:
+    """
+    Records what is indexed for each uploaded document:
+
+        {doc_key: {"file_hash", "updated_at", "pages": {page_hash: {"label", "chunk_ids"}}}}
+
+    doc_key is the file name, prefixed with "<owner>/" outside the default namespace. Pages
+    are keyed by content hash (suffixed "-<n>" for repeats), not position.
+
+    Persisted as JSON next to the Chroma data so re-uploads can skip unchanged pages.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(DATA_DIR, "ingestion_manifest.json")
+        self._lock = threading.Lock()
+        self._doc_locks = defaultdict(threading.Lock)
+        self._docs = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._docs = json.load(f)
+
+    def lock_for(self, doc_key: str) -> threading.Lock:
+        # Serializes concurrent ingests of the same document
+        with self._lock:
+            return self._doc_locks[doc_key]
+
+    def get(self, doc_key: str) -> Optional[dict]:
+        with self._lock:
+            return self._docs.get(doc_key)
+
+    def put(self, doc_key: str, file_hash: str, pages: dict):
+        with self._lock:
+            self._docs[doc_key] = {"file_hash": file_hash, "updated_at": time.time(), "pages": pages}
+            self._save()
+
+    def remove(self, doc_key: str):
+        with self._lock:
+            if self._docs.pop(doc_key, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._docs, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,102 @@
+"""
+Re-embeds knowledge-base collections under a new embedding model.
+
+    python -m app.core.reembed --backend fastembed
+    python -m app.core.reembed --backend huggingface --model BAAI/bge-base-en-v1.5 --owner <user id>
+
+Run it with the server stopped. Each collection is read back a page at a time and
+re-embedded with the same text ingestion embeds, through the BatchEmbedder cache.
+The vectors go to a staging collection tagged with the new model id. The original is then
+renamed to a backup, the staging collection takes over its name and only then is the backup
+deleted (kept with --keep-backup), so an interrupted run never loses the original.
+Afterwards set EMBEDDING_BACKEND / EMBEDDING_MODEL to the same values and restart.
+"""
+from app.core.config import DEFAULT_OWNER
+from app.core.embeddings import BatchEmbedder, build_embed_model, embedding_model_id
+from app.core.vector_store import COLLECTION_NAME, LEGACY_EMBEDDING_MODEL, collection_name, get_chroma_client
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+import argparse
+import time
+
+STAGING_SUFFIX = "__reembed"
+BACKUP_SUFFIX = "__backup"
+
+
+def embed_text(document: str, metadata: dict) -> str:
+    # Rebuild the node so excluded metadata (e.g. owner) stays out, exactly as at ingestion
+    node = metadata_dict_to_node(metadata, text=document)
+    return node.get_content(metadata_mode=MetadataMode.EMBED)
+
+
+def knowledge_base_collections(client):
+    names = [getattr(c, "name", c) for c in client.list_collections()]
+    return [
+        name for name in names
+        if (name == COLLECTION_NAME or name.startswith("aegis_kb_")) and "__" not in name
+    ]
+
+
+def reembed_collection(client, name: str, embedder: BatchEmbedder, model_id: str, page_size: int = 256, keep_backup: bool = False) -> int:
+    """Re-embeds one collection and swaps it in under the same name. Returns the number of chunks."""
+    source = client.get_collection(name)
+    if (source.metadata or {}).get("embed_model", LEGACY_EMBEDDING_MODEL) == model_id and source.count():
+        print(f"{name}: already embedded with {model_id}, skipping")
+        return 0
+
+    staging_name = name + STAGING_SUFFIX
+    if staging_name in [getattr(c, "name", c) for c in client.list_collections()]:
+        # Leftover from an interrupted run
+        client.delete_collection(staging_name)
+    staging = client.create_collection(staging_name, metadata={"embed_model": model_id})
+
+    total = source.count()
+    done = 0
+    start = time.perf_counter()
+    for offset in range(0, total, page_size):
+        page = source.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        texts = [embed_text(doc, meta) for doc, meta in zip(page["documents"], page["metadatas"])]
+        staging.add(
+            ids=page["ids"],
+            embeddings=embedder.embed_texts(texts),
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        done += len(page["ids"])
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {done}/{total} chunks ({done / elapsed:.0f}/s)")
+
+    # Rename, don't delete, until the new collection holds the name: if this is interrupted
+    # the original survives under the backup name
+    backup_name = f"{name}{BACKUP_SUFFIX}{int(time.time())}"
+    source.modify(name=backup_name)
+    staging.modify(name=name)
+    if not keep_backup:
+        client.delete_collection(backup_name)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed knowledge-base collections under a new model")
+    parser.add_argument("--backend", required=True, help="gemini, fastembed or huggingface")
+    parser.add_argument("--model", default=None, help="model name (default: the backend's default)")
+    parser.add_argument("--owner", default=None, help=f"only this owner's collection ('{DEFAULT_OWNER}' for the shared one)")
+    parser.add_argument("--page-size", type=int, default=256)
+    parser.add_argument("--keep-backup", action="store_true", help="rename the old collection instead of deleting it")
+    args = parser.parse_args()
+
+    model_id = embedding_model_id(args.backend, args.model)
+    embed_model = build_embed_model(args.backend, model_id)
+    embedder = BatchEmbedder(embed_model)
+    client = get_chroma_client()
+    names = [collection_name(args.owner)] if args.owner else knowledge_base_collections(client)
+
+    total = 0
+    for name in names:
+        total += reembed_collection(client, name, embedder, model_id, page_size=args.page_size, keep_backup=args.keep_backup)
+    print(f"Re-embedded {total} chunks in {len(names)} collection(s) with {model_id}.")
+    print(f"Set EMBEDDING_BACKEND={args.backend} and EMBEDDING_MODEL={model_id} before restarting the server.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.utils import get_tokenizer
+from app.core.vector_store import DEFAULT_OWNER, GENERATION_KEY, get_collection
+import asyncio
+import math
+import re
+import threading
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 inverted index over the chunks stored in one owner's Chroma collection.
+    Rebuilt lazily whenever the collection's generation or chunk count changes; both live in
+    Chroma, so writes from any worker process are picked up. A rebuild publishes a new
+    snapshot in one assignment, so a concurrent search sees either the old index or the new one.
+    """
+
+    def __init__(self, owner: str = DEFAULT_OWNER, k1: float = 1.5, b: float = 0.75, page_size: int = 1000):
+        self.owner = owner
+        self.k1 = k1
+        self.b = b
+        self.page_size = page_size
+        self._version = None
+        self._lock = threading.Lock()
+        # (ids, texts, metadatas, lengths, postings, avg_length)
+        self._snapshot = ([], [], [], [], {}, 0.0)
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+    def _collection_version(self):
+        collection = get_collection(self.owner)
+        return (collection.metadata or {}).get(GENERATION_KEY, ""), collection.count()
+
+    def _load(self):
+        collection = get_collection(self.owner)
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=self.page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield from zip(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+
+    def _build(self):
+        ids, texts, metadatas, lengths = [], [], [], []
+        postings = defaultdict(list)
+        for i, (node_id, text, metadata) in enumerate(self._load()):
+            terms = Counter(tokenize(text or ""))
+            for term, tf in terms.items():
+                postings[term].append((i, tf))
+            ids.append(node_id)
+            texts.append(text or "")
+            metadatas.append(metadata or {})
+            lengths.append(sum(terms.values()))
+        avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        return ids, texts, metadatas, lengths, dict(postings), avg_length
+
+    def refresh(self):
+        version = self._collection_version()
+        if version == self._version:
+            return
+        with self._lock:
+            # Another caller may have rebuilt while this one waited
+            if version != self._version:
+                self._snapshot = self._build()
+                self._version = version
+
+    def search(self, query: str, top_k: int) -> List[NodeWithScore]:
+        """Blocking (Chroma reads, and a full scan when stale); call it off the event loop."""
+        self.refresh()
+        ids, texts, metadatas, lengths, postings_by_term, avg_length = self._snapshot
+        n = len(ids)
+        if not n:
+            return []
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = postings_by_term.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * lengths[doc] / avg_length)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+        return [
+            NodeWithScore(node=TextNode(id_=ids[doc], text=texts[doc], metadata=metadatas[doc]), score=score)
+            for doc, score in ranked
+        ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[NodeWithScore]], k: int = 60) -> List[NodeWithScore]:
+    fused: Dict[str, float] = defaultdict(float)
+    nodes: Dict[str, NodeWithScore] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            fused[result.node.node_id] += 1.0 / (k + rank + 1)
+            nodes.setdefault(result.node.node_id, result)
+    ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+    return [NodeWithScore(node=nodes[node_id].node, score=score) for node_id, score in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense top-k from the vector index fused with BM25 top-k by reciprocal rank."""
+
+    def __init__(self, vector_retriever: BaseRetriever, bm25: BM25Index, bm25_top_k: int = 10, rrf_k: int = 60):
+        super().__init__()
+        self.vector_retriever = vector_retriever
+        self.bm25 = bm25
+        self.bm25_top_k = bm25_top_k
+        self.rrf_k = rrf_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = self.vector_retriever.retrieve(query_bundle)
+        sparse = self.bm25.search(query_bundle.query_str, self.bm25_top_k)
+        return reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = await self.vector_retriever.aretrieve(query_bundle)
+        sparse = await asyncio.to_thread(self.bm25.search, query_bundle.query_str, self.bm25_top_k)
+        return reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)
+
+
+class BudgetReranker(BaseNodePostprocessor):
+    """
+    Local reranker: blends the fused rank with query-term coverage of each chunk, then keeps
+    the best `top_n` chunks that fit in `token_budget` so the synthesis prompt stays small.
+    """
+
+    top_n: int = 5
+    token_budget: int = 2000
+    coverage_weight: float = 0.5
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BudgetReranker"
+
+    def _postprocess_nodes(self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        if not nodes:
+            return nodes
+        query_terms = set(tokenize(query_bundle.query_str)) if query_bundle else set()
+        top_score = max(n.score or 0.0 for n in nodes) or 1.0
+
+        rescored = []
+        for n in nodes:
+            coverage = 0.0
+            if query_terms:
+                coverage = len(query_terms & set(tokenize(n.node.get_content()))) / len(query_terms)
+            score = (1 - self.coverage_weight) * (n.score or 0.0) / top_score + self.coverage_weight * coverage
+            rescored.append(NodeWithScore(node=n.node, score=score))
+        rescored.sort(key=lambda n: n.score, reverse=True)
+
+        tokenizer = get_tokenizer()
+        kept, used = [], 0
+        for n in rescored:
+            if len(kept) >= self.top_n:
+                break
+            cost = len(tokenizer(n.node.get_content()))
+            if kept and used + cost > self.token_budget:
+                continue
+            kept.append(n)
+            used += cost
+        return kept
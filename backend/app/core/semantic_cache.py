@@ -0,0 +1,111 @@
+from typing import List, Optional
+from app.core.vector_store import DEFAULT_OWNER, collection_generation
+import numpy as np
+import threading
+import time
+
+
+class SemanticCache:
+    """
+    Caches research summaries keyed by the embedding of the research topic.
+    A lookup hits when a stored topic is at least `threshold` cosine-similar and younger than `ttl`.
+    Every entry is dropped as soon as ingestion (in any worker) changes the collection
+    generation, so answers never predate the documents they could have been grounded on.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 3600, threshold: float = 0.95, owner: str = DEFAULT_OWNER):
+        self.owner = owner
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._vectors = None  # (n, dim) matrix of unit-normalized query embeddings
+        self._entries: List[dict] = []
+        self._generation = collection_generation(self.owner)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, keep: np.ndarray):
+        self._entries = [e for e, k in zip(self._entries, keep) if k]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = []
+            self._vectors = None
+            self._generation = generation
+
+    def _expire(self, now: float):
+        if not self._entries:
+            return
+        keep = np.array([now - e["created_at"] < self.ttl_seconds for e in self._entries])
+        if not keep.all():
+            self.evictions += int((~keep).sum())
+            self._drop(keep)
+
+    def generation(self):
+        """Current collection generation; blocking Chroma read. Capture it before computing a value to store."""
+        return collection_generation(self.owner)
+
+    def lookup(self, embedding, generation=None) -> Optional[str]:
+        # Read from Chroma outside the lock
+        if generation is None:
+            generation = self.generation()
+        with self._lock:
+            self._check_generation(generation)
+            self._expire(time.monotonic())
+            if self._entries:
+                scores = self._vectors @ self._unit(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return self._entries[best]["value"]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, value: str, generation=None) -> bool:
+        """
+        Stores `value`, computed against the collection as of `generation`. A value computed
+        before an ingest finished is dropped rather than kept under the newer generation.
+        """
+        current = self.generation()
+        if generation is not None and generation != current:
+            return False
+        with self._lock:
+            self._check_generation(current)
+            vec = self._unit(embedding)[None, :]
+            self._entries.append({"value": value, "created_at": time.monotonic()})
+            self._vectors = vec if self._vectors is None else np.vstack([self._vectors, vec])
+            if len(self._entries) > self.max_size:
+                # Entries are appended in insertion order, so the oldest sit at the front
+                overflow = len(self._entries) - self.max_size
+                keep = np.arange(len(self._entries)) >= overflow
+                self.evictions += overflow
+                self._drop(keep)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Tuple
+from app.core.availability import BusyIndex, Interval
+
+
+@dataclass
+class SchedulingConstraints:
+    weekly_cap_hours: float
+    max_session_hours: float = 2
+    min_session_hours: float = 1
+    max_hours_per_day: float = 4
+    buffer_minutes: int = 15
+    day_start_hour: int = 9
+    day_end_hour: int = 21
+    # Tried first on each day, e.g. (18, 21) for evenings; falls back to the full working window
+    preferred_hours: Optional[Tuple[int, int]] = None
+    horizon_days: int = 120
+
+
+def parse_hour_range(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parses "18-21" into (18, 21); None or empty means no range."""
+    if not value:
+        return None
+    start_hour, end_hour = value.split("-")
+    return int(start_hour), int(end_hour)
+
+
+def split_into_sessions(hours: float, max_session: float, min_session: float, limit: float = None) -> List[float]:
+    """
+    Splits a topic into sessions of at most `max_session` hours, folding a too-short tail into
+    the others. `limit` is a hard ceiling (the daily and weekly caps) the fold must not exceed.
+    """
+    if hours <= max_session:
+        return [hours]
+    count = int(hours // max_session)
+    sessions = [max_session] * count
+    tail = hours - count * max_session
+    if tail >= min_session:
+        sessions.append(tail)
+    elif tail > 0:
+        if limit is None or sessions[-1] + tail <= limit:
+            # Spread the leftover over the last session rather than booking a stub
+            sessions[-1] += tail
+        else:
+            # Folding would break a cap; even sessions stay under max_session instead
+            sessions = [hours / (count + 1)] * (count + 1)
+    return sessions
+
+
+class SessionScheduler:
+    """
+    Places roadmap items as multiple sessions into free time, entirely in memory.
+
+    Items keep their roadmap order. Each session goes into the earliest slot that is free
+    (with a buffer around every event), inside the preferred or working hours, and under
+    the daily and weekly caps. Cost is a couple of bisects per day visited, so hundreds of
+    sessions over multi-month horizons take milliseconds.
+    """
+
+    def __init__(self, constraints: SchedulingConstraints):
+        self.c = constraints
+
+    def _windows(self):
+        windows = []
+        if self.c.preferred_hours:
+            windows.append(self.c.preferred_hours)
+        windows.append((self.c.day_start_hour, self.c.day_end_hour))
+        return windows
+
+    def schedule(self, items: Iterable[dict], busy: Iterable[Interval], start: datetime) -> Tuple[List[dict], List[dict]]:
+        """
+        items: [{"topic", "duration_hours"}]. Returns (sessions, unscheduled), where each session is
+        {"topic", "session", "sessions_total", "start", "end"} with datetime bounds.
+        """
+        buffer = timedelta(minutes=self.c.buffer_minutes)
+        index = BusyIndex((s - buffer, e + buffer) for s, e in busy)
+        horizon_end = start + timedelta(days=self.c.horizon_days)
+        weekly = defaultdict(float)
+        daily = defaultdict(float)
+
+        # A session longer than the daily or weekly cap could never be placed
+        limit = min(self.c.weekly_cap_hours, self.c.max_hours_per_day)
+        max_session = min(self.c.max_session_hours, limit)
+        min_session = min(self.c.min_session_hours, max_session)
+
+        sessions, unscheduled = [], []
+        cursor = start
+        for position, item in enumerate(items):
+            parts = split_into_sessions(float(item['duration_hours']), max_session, min_session, limit=limit)
+            for n, hours in enumerate(parts, start=1):
+                slot = self._place(index, cursor, hours, horizon_end, weekly, daily)
+                if slot is None:
+                    unscheduled.append({"topic": item['topic'], "session": n, "sessions_total": len(parts), "hours": hours})
+                    continue
+                slot_start, slot_end = slot
+                index.add(slot_start - buffer, slot_end + buffer)
+                weekly[slot_start.isocalendar()[:2]] += hours
+                daily[slot_start.date()] += hours
+                sessions.append({
+                    "item": position,
+                    "topic": item['topic'],
+                    "session": n,
+                    "sessions_total": len(parts),
+                    "start": slot_start,
+                    "end": slot_end
+                })
+                cursor = slot_end
+        return sessions, unscheduled
+
+    def _place(self, index: BusyIndex, cursor: datetime, hours: float, horizon_end: datetime, weekly, daily):
+        duration = timedelta(hours=hours)
+        if hours > self.c.weekly_cap_hours or hours > self.c.max_hours_per_day:
+            return None
+
+        day: date = cursor.date()
+        while datetime.combine(day, time()) < horizon_end:
+            week = day.isocalendar()[:2]
+            if weekly[week] + hours > self.c.weekly_cap_hours:
+                # Week is full: jump to next Monday
+                day += timedelta(days=7 - day.weekday())
+                continue
+            if daily[day] + hours <= self.c.max_hours_per_day:
+                for start_hour, end_hour in self._windows():
+                    window_open = datetime.combine(day, time(start_hour))
+                    window_close = min(window_open + timedelta(hours=end_hour - start_hour), horizon_end)
+                    slot = index.next_free_slot(
+                        max(cursor, window_open),
+                        duration,
+                        day_start_hour=start_hour,
+                        day_end_hour=end_hour,
+                        until=window_close
+                    )
+                    if slot is not None:
+                        return slot
+            day += timedelta(days=1)
+        return None
@@ -0,0 +1,301 @@
+"""
+Request tracing and Prometheus-style metrics.
+
+Agent nodes and Calendar calls are wrapped with `traced`; LLM and embedding calls are
+picked up from llama_index's instrumentation events, so calls made inside query engines
+are counted too. Every operation updates the process-wide `metrics` registry (served on
+/metrics) and the `RequestTrace` of the HTTP request it runs under. With OTEL_ENABLED,
+each operation is also emitted as an OpenTelemetry span; exporters are configured the
+usual OpenTelemetry way (SDK setup or `opentelemetry-instrument`).
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+import functools
+import inspect
+import threading
+import time
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, dict, float]  # (metric name, type, labels, value)
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough English-text estimate, used when the provider reports no usage
+    return max(1, len(text) // 4) if text else 0
+
+
+class RequestTrace:
+    """Per-request totals by operation kind: calls, wall time and prompt/completion tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, kind: str, seconds: float):
+        with self._lock:
+            self.calls[kind] += 1
+            self.seconds[kind] += seconds
+
+    def add_tokens(self, prompt: int, completion: int):
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{kind} {self.calls[kind]}x {self.seconds[kind]:.3f}s" for kind in sorted(self.calls)]
+            if self.prompt_tokens or self.completion_tokens:
+                parts.append(f"tokens {self.prompt_tokens}+{self.completion_tokens}")
+        return " | ".join(parts)
+
+
+# Contextvars follow asyncio tasks and asyncio.to_thread, so work done on behalf of a
+# request is attributed to it even off the event loop thread
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[Labels, int] = defaultdict(int)
+        self.errors: Dict[Labels, int] = defaultdict(int)
+        self.seconds: Dict[Labels, float] = defaultdict(float)
+        self.tokens: Dict[Labels, int] = defaultdict(int)
+        self.requests: Dict[Labels, int] = defaultdict(int)
+        self.request_seconds: Dict[Labels, float] = defaultdict(float)
+        self._collectors: List[Callable[[], List[Sample]]] = []
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False):
+        key = (("kind", kind), ("name", name))
+        with self._lock:
+            self.calls[key] += 1
+            self.seconds[key] += seconds
+            if error:
+                self.errors[key] += 1
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record(kind, seconds)
+
+    def add_tokens(self, kind: str, prompt: int, completion: int = 0):
+        with self._lock:
+            self.tokens[(("kind", kind), ("direction", "prompt"))] += prompt
+            self.tokens[(("kind", kind), ("direction", "completion"))] += completion
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_tokens(prompt, completion)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (("method", method), ("route", route), ("status", str(status)))
+        with self._lock:
+            self.requests[key] += 1
+            self.request_seconds[key] += seconds
+
+    def register_collector(self, collector: Callable[[], List[Sample]]):
+        """Adds a callback evaluated at scrape time, e.g. to export cache or classifier stats."""
+        self._collectors.append(collector)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            samples = [("aegis_operation_calls_total", "counter", dict(k), v) for k, v in self.calls.items()]
+            samples += [("aegis_operation_errors_total", "counter", dict(k), v) for k, v in self.errors.items()]
+            samples += [("aegis_operation_seconds_total", "counter", dict(k), v) for k, v in self.seconds.items()]
+            samples += [("aegis_tokens_total", "counter", dict(k), v) for k, v in self.tokens.items()]
+            samples += [("aegis_http_requests_total", "counter", dict(k), v) for k, v in self.requests.items()]
+            samples += [("aegis_http_request_seconds_total", "counter", dict(k), v) for k, v in self.request_seconds.items()]
+        for collector in self._collectors:
+            try:
+                samples += collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return samples
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        by_name: Dict[str, List[Sample]] = {}
+        for sample in self.samples():
+            by_name.setdefault(sample[0], []).append(sample)
+        lines = []
+        for name, group in by_name.items():
+            lines.append(f"# TYPE {name} {group[0][1]}")
+            for _, _, labels, value in group:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
+
+_tracer = None
+if settings.OTEL_ENABLED:
+    from opentelemetry import trace as otel_trace
+    _tracer = otel_trace.get_tracer("aegis")
+
+
+class _Span:
+    """Times one operation; records metrics on exit and mirrors it as an OpenTelemetry span."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self._otel = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(f"{self.kind}.{self.name}", attributes={"aegis.kind": self.kind})
+            self._otel.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics.observe(self.kind, self.name, time.perf_counter() - self._start, error=exc_type is not None)
+        if self._otel is not None:
+            self._otel.__exit__(exc_type, exc, tb)
+        return False
+
+
+def span(kind: str, name: str) -> _Span:
+    return _Span(kind, name)
+
+
+def traced(kind: str, name: str = None):
+    """
+    Decorator (or wrapper for bound methods) timing sync and async callables.
+    functools.wraps keeps the signature visible, so LangGraph still passes `config` to nodes.
+    """
+    def decorate(func):
+        op = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, op):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, op):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _usage_tokens(response, prompt_text: str) -> Tuple[int, int]:
+    # Gemini reports usage_metadata in the raw response; fall back to an estimate otherwise
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage_metadata") if isinstance(raw, dict) else getattr(raw, "usage_metadata", None)
+    if usage:
+        get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+        prompt = get("prompt_token_count")
+        completion = get("candidates_token_count")
+        if prompt is not None and completion is not None:
+            return int(prompt), int(completion)
+    text = getattr(response, "text", None) or str(getattr(response, "message", "") or "")
+    return estimate_tokens(prompt_text), estimate_tokens(text)
+
+
+_llama_index_instrumented = False
+
+
+def instrument_llama_index():
+    """Registers an event handler on llama_index's root dispatcher (once per process)."""
+    global _llama_index_instrumented
+    if _llama_index_instrumented:
+        return
+    from llama_index.core.instrumentation import get_dispatcher
+    from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+    from llama_index.core.instrumentation.events.embedding import EmbeddingEndEvent, EmbeddingStartEvent
+    from llama_index.core.instrumentation.events.llm import (
+        LLMChatEndEvent, LLMChatStartEvent, LLMCompletionEndEvent, LLMCompletionStartEvent
+    )
+
+    starts = {}
+    start_events = (LLMCompletionStartEvent, LLMChatStartEvent, EmbeddingStartEvent)
+
+    class TelemetryEventHandler(BaseEventHandler):
+        @classmethod
+        def class_name(cls) -> str:
+            return "TelemetryEventHandler"
+
+        def handle(self, event, **kwargs):
+            if isinstance(event, start_events):
+                if len(starts) > 10000:
+                    # End events never arrive for abandoned streams; don't let those accumulate
+                    starts.clear()
+                starts[event.span_id] = time.perf_counter()
+                return
+            if isinstance(event, LLMCompletionEndEvent):
+                kind, op, prompt_text = "llm", "completion", event.prompt
+            elif isinstance(event, LLMChatEndEvent):
+                kind, op, prompt_text = "llm", "chat", "\n".join(str(m.content or "") for m in event.messages)
+            elif isinstance(event, EmbeddingEndEvent):
+                kind, op, prompt_text = "embedding", "embed", None
+            else:
+                return
+
+            started = starts.pop(event.span_id, None)
+            if started is not None:
+                metrics.observe(kind, op, time.perf_counter() - started)
+            if kind == "llm":
+                prompt, completion = _usage_tokens(event.response, prompt_text)
+            else:
+                prompt, completion = sum(estimate_tokens(chunk) for chunk in event.chunks), 0
+            metrics.add_tokens(kind, prompt, completion)
+            if _tracer is not None:
+                current = otel_trace.get_current_span()
+                current.add_event(f"{kind}.{op}", {"prompt_tokens": prompt, "completion_tokens": completion})
+
+    get_dispatcher().add_event_handler(TelemetryEventHandler())
+    _llama_index_instrumented = True
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving each HTTP request a RequestTrace. The request is timed until the
+    last body chunk is sent, so streamed responses are measured end to end.
+    """
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        status = 500
+        start = time.perf_counter()
+        otel = None
+        if _tracer is not None:
+            otel = _tracer.start_as_current_span(f"{scope['method']} {scope['path']}", kind=otel_trace.SpanKind.SERVER)
+            otel.__enter__()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            # Label by route template (e.g. /upload/{job_id}) to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.observe_request(scope["method"], route, status, seconds)
+            if settings.TRACE_REQUESTS:
+                print(f"TRACE {scope['method']} {route} {status} {seconds:.3f}s | {trace.summary()}")
+            if otel is not None:
+                otel.__exit__(None, None, None)
+            current_trace.reset(token)
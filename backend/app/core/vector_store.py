@@ -1,51 +1,155 @@
 import chromadb
+from app.core.config import DEFAULT_OWNER
+from app.core.telemetry import instrument_llama_index
+from app.core.embeddings import build_embed_model, embedding_model_id
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.embeddings.gemini import GeminiEmbedding
 from llama_index.core import Settings
+import hashlib
 import os
+import threading
+import uuid
 
 # Ensure the data directory exists
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "chroma_db")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-def get_vector_store():
-    # Initialize ChromaDB persistent client
-    db = chromadb.PersistentClient(path=DATA_DIR)
-    
+COLLECTION_NAME = "aegis_knowledge_base"
+
+# Each user gets their own collection so queries only ever scan that user's corpus.
+# The shared default namespace keeps the original collection name.
+
+def collection_name(owner: str = DEFAULT_OWNER):
+    if not owner or owner == DEFAULT_OWNER:
+        return COLLECTION_NAME
+    return f"aegis_kb_{hashlib.sha256(owner.encode('utf-8')).hexdigest()[:24]}"
+
+# Process-wide registry: one Chroma client plus one vector store and index per namespace,
+# shared by every component. Everything is created lazily on first use (or by
+# init_vector_store at app startup).
+_lock = threading.RLock()
+_client = None
+_vector_stores = {}
+_indexes = {}
+_models_ready = False
+
+# Changed whenever ingestion writes to a collection so caches derived from it can invalidate.
+# Kept in the collection's own metadata, so every worker process sees writes made by any other.
+GENERATION_KEY = "aegis_generation"
+
+def collection_generation(owner: str = DEFAULT_OWNER):
+    collection = get_chroma_client().get_or_create_collection(collection_name(owner))
+    return (collection.metadata or {}).get(GENERATION_KEY, "")
+
+def mark_collection_updated(owner: str = DEFAULT_OWNER):
+    collection = get_chroma_client().get_or_create_collection(collection_name(owner))
+    # hnsw settings can't be modified after creation; a fresh random value (not a counter)
+    # can't be lost to two workers bumping at once
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    collection.modify(metadata={**metadata, GENERATION_KEY: uuid.uuid4().hex})
+
+def get_chroma_client():
+    global _client
+    with _lock:
+        if _client is None:
+            # Initialize ChromaDB persistent client
+            _client = chromadb.PersistentClient(path=DATA_DIR)
+        return _client
+
+# Collections created before the model id was recorded were all embedded with this model
+LEGACY_EMBEDDING_MODEL = "models/embedding-001"
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    pass
+
+
+def check_collection_model(collection):
+    """
+    Collections are tagged with the id of the model their vectors came from. Querying one with
+    another model either fails on dimensions or silently returns unrelated chunks, so refuse.
+    """
+    expected = embedding_model_id()
+    metadata = collection.metadata or {}
+    recorded = metadata.get("embed_model")
+    if recorded is None:
+        if collection.count() == 0:
+            tagged = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+            collection.modify(metadata={**tagged, "embed_model": expected})
+            return
+        recorded = LEGACY_EMBEDDING_MODEL
+    if recorded != expected:
+        raise EmbeddingModelMismatch(
+            f"Collection {collection.name} was embedded with {recorded} but the configured model is {expected}; "
+            f"re-embed it with: python -m app.core.reembed"
+        )
+
+
+def get_collection(owner: str = DEFAULT_OWNER):
     # Get or create collection
-    chroma_collection = db.get_or_create_collection("aegis_knowledge_base")
-    
-    # Create vector store
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    
-    return vector_store
+    collection = get_chroma_client().get_or_create_collection(collection_name(owner))
+    check_collection_model(collection)
+    return collection
+
+def get_vector_store(owner: str = DEFAULT_OWNER):
+    name = collection_name(owner)
+    with _lock:
+        if name not in _vector_stores:
+            _vector_stores[name] = ChromaVectorStore(chroma_collection=get_collection(owner))
+        return _vector_stores[name]
 
 from llama_index.llms.gemini import Gemini
 import google.generativeai as genai
 
 def setup_embeddings():
-    # Configure global settings to use Gemini embeddings and LLM
-    api_key = os.getenv("GEMINI_API_KEY")
-    if api_key:
-        os.environ["GOOGLE_API_KEY"] = api_key
-        genai.configure(api_key=api_key)
-    
-    # Set Embedding Model
-    Settings.embedding_model = GeminiEmbedding(model_name="models/embedding-001", api_key=api_key)
-    
-    # Set LLM (to avoid OpenAI default)
-    Settings.llm = Gemini(model="models/gemini-2.0-flash", api_key=api_key)
-
-def get_index():
-    vector_store = get_vector_store()
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    
+    # Configure global settings for embeddings and the Gemini LLM (once per process)
+    global _models_ready
+    with _lock:
+        if _models_ready:
+            return
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            os.environ["GOOGLE_API_KEY"] = api_key
+            genai.configure(api_key=api_key)
+        
+        # Set Embedding Model (Gemini API by default, or a local CPU model; see EMBEDDING_BACKEND)
+        Settings.embedding_model = build_embed_model()
+        
+        # Set LLM (to avoid OpenAI default)
+        Settings.llm = Gemini(model="models/gemini-2.0-flash", api_key=api_key)
+        # Count and time every LLM/embedding call made through llama_index
+        instrument_llama_index()
+        _models_ready = True
+
+def get_index(owner: str = DEFAULT_OWNER):
+    # Shared index over the shared store: nodes ingested by DocumentProcessor are
+    # immediately visible to every query engine built from it
+    name = collection_name(owner)
+    with _lock:
+        if name not in _indexes:
+            setup_embeddings()
+            vector_store = get_vector_store(owner)
+            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+            
+            # Load index from storage
+            _indexes[name] = VectorStoreIndex.from_vector_store(
+                vector_store,
+                storage_context=storage_context,
+                embed_model=Settings.embedding_model
+            )
+        return _indexes[name]
+
+def init_vector_store():
+    """Startup hook: builds the models, client and the default namespace's store and index up front."""
     setup_embeddings()
-    
-    # Load index from storage
-    return VectorStoreIndex.from_vector_store(
-        vector_store,
-        storage_context=storage_context,
-        embed_model=Settings.embedding_model
-    )
+    get_index()
+
+def close_vector_store():
+    """Shutdown hook: drops the shared objects so the next use starts fresh."""
+    global _client
+    with _lock:
+        if _client is not None and hasattr(_client, "clear_system_cache"):
+            _client.clear_system_cache()
+        _client = None
+        _vector_stores.clear()
+        _indexes.clear()
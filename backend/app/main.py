@@ -1,26 +1,126 @@
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
+import sys
 
 # Load env vars before importing other modules that might use them
 load_dotenv()
 if os.getenv("GEMINI_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
-from app.tools.google_calendar import GoogleCalendarTool
-from app.agents.scheduler import SchedulerAgent
-from app.core.ingestion import DocumentProcessor
-from app.agents.orchestrator import OrchestratorAgent
-from app.agents.planner import PlannerAgent
-from datetime import datetime
+from app.core.jobs import IngestionQueue, QueueFullError, UploadBackpressureMiddleware
+from app.core.checkpoint import CheckpointStore
+from app.core.lazy import lazy, aresolve
+from app.core.config import settings, DEFAULT_OWNER
+from app.core.intent import extract_topic, same_topic
+from app.agents.request_slots import parse_timezone
+from app.core.telemetry import TracingMiddleware, metrics
+from contextlib import asynccontextmanager
+from typing import Optional
+from datetime import datetime, timedelta
+import asyncio
 import uvicorn
+import json
 import shutil
 import uuid
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+# Heavy dependencies (llama_index, chromadb, langgraph, googleapiclient, Gemini) are only
+# imported when a component is first built, either by a request or by warm_up().
+
+@lazy
+def get_calendar_tool():
+    from app.tools.google_calendar import GoogleCalendarTool
+    return GoogleCalendarTool()
+
+@lazy
+def get_scheduler_agent():
+    from app.agents.scheduler import SchedulerAgent
+    return SchedulerAgent()
+
+@lazy
+def get_doc_processor():
+    from app.core.ingestion import DocumentProcessor
+    return DocumentProcessor()
+
+@lazy
+def get_orchestrator_agent():
+    from app.agents.orchestrator import OrchestratorAgent
+    return OrchestratorAgent()
+
+@lazy
+def get_planner_agent():
+    from app.agents.planner import PlannerAgent
+    return PlannerAgent(checkpoints=checkpoints)
+
+def process_upload(*args, **kwargs):
+    return get_doc_processor().process_pdf(*args, **kwargs)
+
+checkpoints = CheckpointStore()
+ingestion_queue = IngestionQueue(
+    process_upload,
+    max_workers=settings.INGEST_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING
+)
+
+def warm_up():
+    """Builds the shared vector store and every agent so the first request pays no import cost."""
+    from app.core.vector_store import init_vector_store
+    init_vector_store()
+    for getter in (get_calendar_tool, get_scheduler_agent, get_doc_processor, get_orchestrator_agent, get_planner_agent):
+        getter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # STARTUP_MODE: "lazy" builds on first use, "background" warms up after the server
+    # starts accepting requests, "eager" finishes warming up before serving
+    await checkpoints.setup()
+    warm_up_task = None
+    if settings.STARTUP_MODE == "eager":
+        await run_in_threadpool(warm_up)
+    elif settings.STARTUP_MODE == "background":
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    ingestion_queue.shutdown()
+    await checkpoints.close()
+    if "app.core.vector_store" in sys.modules:
+        sys.modules["app.core.vector_store"].close_vector_store()
+
+def component_stats():
+    """Scrape-time gauges from caches and classifiers; components that were never built are skipped."""
+    samples = []
+    if get_orchestrator_agent.is_loaded():
+        classifier = get_orchestrator_agent().classifier
+        for tier, count in classifier.stats()["hits"].items():
+            samples.append(("aegis_intent_classifications_total", "counter", {"tier": tier}, count))
+    if get_planner_agent.is_loaded():
+        # Aggregated over users so the label set stays bounded
+        for key, value in get_planner_agent().researcher.cache_stats().items():
+            kind = "gauge" if key == "size" else "counter"
+            samples.append((f"aegis_research_cache_{key}" + ("" if kind == "gauge" else "_total"), kind, {}, value))
+    if "app.agents.roadmap" in sys.modules:
+        for outcome in ("attempts", "retried", "failed"):
+            samples.append(("aegis_roadmap_parse_total", "counter", {"outcome": outcome}, sys.modules["app.agents.roadmap"].parse_stats[outcome]))
+    if "app.tools.google_calendar" in sys.modules:
+        pool = sys.modules["app.tools.google_calendar"].service_pool
+        samples.append(("aegis_calendar_service_pool_hits_total", "counter", {}, pool.hits))
+        samples.append(("aegis_calendar_service_pool_misses_total", "counter", {}, pool.misses))
+    return samples
+
+metrics.register_collector(component_stats)
+
+app = FastAPI(lifespan=lifespan)
+
+# Rejects uploads while ingestion is saturated, before the request body is read
+app.add_middleware(UploadBackpressureMiddleware, queue=ingestion_queue)
+
+# Times every request and attributes node, Calendar, LLM and embedding calls to it
+app.add_middleware(TracingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,11 +129,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-calendar_tool = GoogleCalendarTool()
-scheduler_agent = SchedulerAgent()
-doc_processor = DocumentProcessor()
-orchestrator_agent = OrchestratorAgent()
-planner_agent = PlannerAgent()
 
 # Simple in-memory storage for demo purposes
 # In production, use a database or secure session storage
@@ -43,25 +138,24 @@ user_creds = {}
 def read_root():
     return {"message": "Welcome to Aegis LifeOS"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/auth/google")
 def login_google():
-    auth_url = calendar_tool.get_auth_url()
+    auth_url = get_calendar_tool().get_auth_url()
     return RedirectResponse(auth_url)
 
 @app.get("/auth/callback")
 def auth_callback(code: str):
-    creds = calendar_tool.authenticate(code)
+    creds = get_calendar_tool().authenticate(code)
     # Store creds in memory (keyed by a simple ID for now, or just global)
     user_creds['default'] = creds
     return {"message": "Authentication successful! You can now use the scheduler."}
 
-@app.post("/schedule/check")
-def check_schedule(start_time: datetime, end_time: datetime, summary: str = "Study Session"):
-    if 'default' not in user_creds:
-        raise HTTPException(status_code=401, detail="User not authenticated. Go to /auth/google first.")
-    
-    creds = user_creds['default']
-    
+def run_schedule_check(creds, start_time: datetime, end_time: datetime, summary: str = "Study Session", tz=None):
+    # Times are naive UTC; `tz` only sets the working hours and the times shown in the message
     initial_state = {
         "creds": creds,
         "start_time": start_time,
@@ -69,10 +163,12 @@ def check_schedule(start_time: datetime, end_time: datetime, summary: str = "Stu
         "summary": summary,
         "conflict": False,
         "suggested_slots": [],
-        "message": ""
+        "message": "",
+        "timezone": tz,
+        "busy": []
     }
     
-    result = scheduler_agent.app.invoke(initial_state)
+    result = get_scheduler_agent().app.invoke(initial_state)
     
     return {
         "conflict": result['conflict'],
@@ -80,55 +176,155 @@ def check_schedule(start_time: datetime, end_time: datetime, summary: str = "Stu
         "suggested_slots": result['suggested_slots']
     }
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.post("/schedule/check")
+def check_schedule(start_time: datetime, end_time: datetime, summary: str = "Study Session"):
+    if 'default' not in user_creds:
+        raise HTTPException(status_code=401, detail="User not authenticated. Go to /auth/google first.")
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time.")
+    
+    return run_schedule_check(user_creds['default'], start_time, end_time, summary)
+
+async def schedule_from_slots(creds, scheduler_state: dict, tz=None):
+    """Runs SchedulerAgent on the times the orchestrator already parsed; no further LLM call."""
+    start_time = scheduler_state.get('start_time')
+    if start_time is None:
+        return {"intent": "schedule", "response": "When should it be? Please include a date and time."}
+    end_time = scheduler_state.get('end_time') or start_time + timedelta(hours=1)
+    result = await asyncio.to_thread(
+        run_schedule_check, creds, start_time, end_time, scheduler_state.get('summary') or "Study Session", tz
+    )
+    return {
+        "intent": "schedule",
+        "start_time": start_time,
+        "end_time": end_time,
+        "response": result['message'],
+        **result
+    }
+
+def get_bearer_creds(request: Request):
+    from google.oauth2.credentials import Credentials
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        return Credentials(token=token)
+    return None
+
+def get_request_creds(request: Request):
+    creds = get_bearer_creds(request)
+        
+    if not creds and 'default' in user_creds:
+        creds = user_creds['default']
+        
+    if not creds:
+        raise HTTPException(status_code=401, detail="User not authenticated.")
+    return creds
+
+async def resolve_owner(creds):
+    # Knowledge-base namespace for the caller. Anonymous uploads and the dev creds
+    # from /auth/google share the default namespace; everyone else gets their own.
+    if creds is None or creds is user_creds.get('default'):
+        return DEFAULT_OWNER
+    try:
+        return await asyncio.to_thread(get_calendar_tool().get_user_id, creds)
+    except Exception as e:
+        print(f"Could not resolve user id: {e}")
+        raise HTTPException(status_code=401, detail="Could not verify user identity.")
+
+@app.post("/upload", status_code=202)
+async def upload_file(request: Request, file: UploadFile = File(...)):
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
+    owner = await resolve_owner(get_bearer_creds(request))
     
-    # Create temp file
+    # Create temp file (unique name so concurrent uploads of the same file don't collide)
     temp_dir = "temp_uploads"
     os.makedirs(temp_dir, exist_ok=True)
-    temp_path = os.path.join(temp_dir, file.filename)
+    temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.pdf")
     
     try:
         with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Process file
-        num_chunks = doc_processor.process_pdf(temp_path)
-        
-        return {"message": f"Successfully processed {file.filename}", "chunks_created": num_chunks}
-    
+            await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
+        # Parsing and embedding run on the ingestion worker pool; the job removes the temp file
+        job = await run_in_threadpool(ingestion_queue.submit, temp_path, file.filename, owner)
+    except QueueFullError as e:
+        # Filled up while this body was being received (the middleware checks before that)
+        os.remove(temp_path)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup
         if os.path.exists(temp_path):
             os.remove(temp_path)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"message": f"Queued {file.filename} for processing", "job_id": job.id, "state": job.state}
+
+@app.get("/upload/{job_id}")
+async def upload_status(job_id: str, request: Request):
+    owner = await resolve_owner(get_bearer_creds(request))
+    # Job state is shared through SQLite, so any worker process can answer
+    job = await run_in_threadpool(ingestion_queue.get, job_id)
+    if job is None or job.owner != owner:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job.")
+    return job.to_dict()
 
-from google.oauth2.credentials import Credentials
+def sse_event(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def start_speculative_research(query: str, creds):
+    """
+    With SPECULATIVE_RESEARCH on, starts the planner's research step while the intent is still
+    being classified, taking the common "learn" case's research call off the critical path.
+    Returns (topic researched, task), or None.
+    """
+    if not settings.SPECULATIVE_RESEARCH:
+        return None
+    topic = extract_topic(query)
+
+    async def research():
+        planner_agent = await aresolve(get_planner_agent)
+        return await planner_agent.research(topic, owner=await resolve_owner(creds))
+
+    task = asyncio.create_task(research())
+    # Retrieve the outcome even when nobody awaits it, so failures are not reported as unhandled
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return topic, task
+
+def cancel_speculation(speculation):
+    if speculation is not None:
+        speculation[1].cancel()
+
+async def speculative_summary(speculation, intent: str, topic: str) -> str:
+    """Research summary from a speculative task, or "" if there is none or it does not apply (task is then cancelled)."""
+    if speculation is None:
+        return ""
+    speculative_topic, task = speculation
+    # Decided before awaiting: research on another topic is dropped right away, not after it finishes
+    if intent != "learn" or not same_topic(speculative_topic, topic):
+        task.cancel()
+        return ""
+    try:
+        return await task
+    except Exception as e:
+        print(f"Speculative research failed, researching in the planner instead: {e}")
+        return ""
+
+def client_timezone(tz: Optional[str]):
+    try:
+        return parse_timezone(tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/agent/run")
-def run_agent(query: str, request: Request):
-    creds = None
-    
-    # Check for Authorization header (Bearer token)
-    auth_header = request.headers.get('Authorization')
-    print(f"DEBUG: Auth Header: {auth_header}")
-    
-    if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header.split(' ')[1]
-        print(f"DEBUG: Token extracted: {token[:10]}...")
-        creds = Credentials(token=token)
-        print(f"DEBUG: Creds created: {creds}")
-    
-    # Fallback to in-memory creds (for dev/testing via /auth/google)
+async def run_agent(query: str, request: Request, tz: Optional[str] = None):
+    # tz: the client's IANA timezone or UTC offset; relative times like "tomorrow at 3pm"
+    # are resolved in it. Without it they are read as UTC. Returned times are naive UTC.
+    client_tz = client_timezone(tz)
+    # Bearer token from the client, falling back to in-memory creds (dev/testing via /auth/google)
+    creds = get_bearer_creds(request)
     if not creds and 'default' in user_creds:
-        print("DEBUG: Using in-memory creds")
         creds = user_creds['default']
         
     if not creds:
-        print("DEBUG: No creds found")
         raise HTTPException(status_code=401, detail="User not authenticated. Please sign in.")
     
     # 1. Run Orchestrator to determine intent
@@ -138,30 +334,42 @@ def run_agent(query: str, request: Request):
         "planner_state": {},
         "scheduler_state": {},
         "final_response": "",
-        "creds": creds
+        "slots": {},
+        "creds": creds,
+        "timezone": client_tz
     }
-    orch_result = orchestrator_agent.app.invoke(initial_orch_state)
+    speculation = start_speculative_research(query, creds)
+    try:
+        orchestrator_agent = await aresolve(get_orchestrator_agent)
+        orch_result = await orchestrator_agent.app.ainvoke(initial_orch_state)
+    except BaseException:
+        cancel_speculation(speculation)
+        raise
+    
+    topic = orch_result.get('planner_state', {}).get('topic')
+    research_summary = await speculative_summary(speculation, orch_result['intent'], topic)
     
     if orch_result['intent'] == 'learn':
         # 2. Start Planner with a new thread
+        planner_agent = await aresolve(get_planner_agent)
         thread_id = str(uuid.uuid4())
-        topic = orch_result['planner_state']['topic']
         
         initial_planner_state = {
             "topic": topic,
-            "hours_per_week": 5,
-            "creds": creds,
-            "research_summary": "",
+            "hours_per_week": orch_result['planner_state'].get('hours_per_week') or 5,
+            "research_summary": research_summary,
             "roadmap": [],
             "scheduled_plan": [],
             "feedback": None,
             "approved": False
         }
         
-        config = {"configurable": {"thread_id": thread_id}}
+        owner = await resolve_owner(creds)
+        config = {"configurable": {"thread_id": thread_id, "creds": creds, "owner": owner}}
+        await checkpoints.touch(thread_id)
         
         # Invoke planner - it should pause before human_approval
-        planner_result = planner_agent.app.invoke(initial_planner_state, config=config)
+        planner_result = await planner_agent.app.ainvoke(initial_planner_state, config=config)
         
         # Check if we have a roadmap (paused state)
         # Note: invoke returns the final state of the run. If interrupted, it returns state at interruption.
@@ -175,37 +383,117 @@ def run_agent(query: str, request: Request):
         }
         
     elif orch_result['intent'] == 'schedule':
-        # TODO: Implement Scheduler flow
-        return {
-            "intent": "schedule",
-            "response": orch_result['final_response']
-        }
+        return await schedule_from_slots(creds, orch_result['scheduler_state'], client_tz)
     
     return {"intent": "unknown", "response": "Could not understand request."}
 
+@app.post("/agent/run/stream")
+async def run_agent_stream(query: str, request: Request, tz: Optional[str] = None):
+    # Same flow as /agent/run, but node transitions and roadmap tokens are pushed as Server-Sent Events
+    client_tz = client_timezone(tz)
+    creds = get_request_creds(request)
+    thread_id = str(uuid.uuid4())
+
+    async def event_stream():
+        # Flush something immediately so the client gets its first byte before any LLM call
+        yield sse_event("start", {"thread_id": thread_id})
+        try:
+            async for event in agent_events():
+                yield event
+        except Exception as e:
+            # The status line is already sent; end the stream with a terminal event instead
+            print(f"Agent stream {thread_id} failed: {e!r}")
+            detail = e.detail if isinstance(e, HTTPException) else "Agent run failed."
+            yield sse_event("error", {"thread_id": thread_id, "detail": detail})
+
+    async def agent_events():
+
+        initial_orch_state = {
+            "input_text": query,
+            "intent": "unknown",
+            "planner_state": {},
+            "scheduler_state": {},
+            "final_response": "",
+            "slots": {},
+            "creds": creds,
+            "timezone": client_tz
+        }
+        speculation = start_speculative_research(query, creds)
+        try:
+            orchestrator_agent = await aresolve(get_orchestrator_agent)
+            orch_result = await orchestrator_agent.app.ainvoke(initial_orch_state)
+        except BaseException:
+            # Includes the client disconnecting mid-stream
+            cancel_speculation(speculation)
+            raise
+        yield sse_event("intent", {"intent": orch_result['intent']})
+
+        topic = orch_result.get('planner_state', {}).get('topic')
+        research_summary = await speculative_summary(speculation, orch_result['intent'], topic)
+        if orch_result['intent'] == 'schedule':
+            yield sse_event("done", await schedule_from_slots(creds, orch_result['scheduler_state'], client_tz))
+            return
+        if orch_result['intent'] != 'learn':
+            yield sse_event("done", {"intent": "unknown", "response": "Could not understand request."})
+            return
+
+        planner_agent = await aresolve(get_planner_agent)
+        initial_planner_state = {
+            "topic": topic,
+            "hours_per_week": orch_result['planner_state'].get('hours_per_week') or 5,
+            "research_summary": research_summary,
+            "roadmap": [],
+            "scheduled_plan": [],
+            "feedback": None,
+            "approved": False
+        }
+        owner = await resolve_owner(creds)
+        config = {"configurable": {"thread_id": thread_id, "creds": creds, "owner": owner}}
+        await checkpoints.touch(thread_id)
+
+        async for mode, chunk in planner_agent.app.astream(initial_planner_state, config=config, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                yield sse_event(chunk.pop("event"), chunk)
+                continue
+            for node in chunk:
+                if not node.startswith("__"):
+                    yield sse_event("node", {"node": node, "status": "completed"})
+
+        snapshot = await planner_agent.app.aget_state(config)
+        yield sse_event("done", {
+            "intent": "learn",
+            "thread_id": thread_id,
+            "status": "paused",
+            "roadmap": snapshot.values.get('roadmap', []),
+            "message": "Plan generated. Please review and approve or provide feedback."
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/agent/feedback")
-def agent_feedback(thread_id: str, action: str, request: Request, feedback: str = None):
+async def agent_feedback(thread_id: str, action: str, request: Request, feedback: str = None):
     # action: "COMMIT" or "UPDATE"
     
-    # We don't strictly need creds here for the planner update, but good to validate
-    creds = None
-    auth_header = request.headers.get('Authorization')
-    if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header.split(' ')[1]
-        creds = Credentials(token=token)
-        
-    if not creds and 'default' in user_creds:
-        creds = user_creds['default']
-        
-    if not creds:
-        raise HTTPException(status_code=401, detail="User not authenticated.")
+    # Creds are re-resolved per request; they are never stored in the checkpoint
+    creds = get_request_creds(request)
 
-    config = {"configurable": {"thread_id": thread_id}}
+    config = {"configurable": {"thread_id": thread_id, "creds": creds}}
+    planner_agent = await aresolve(get_planner_agent)
+    snapshot = await planner_agent.app.aget_state(config)
+    if not snapshot.values:
+        raise HTTPException(status_code=404, detail="Unknown or expired plan thread.")
+    await checkpoints.touch(thread_id)
     
     if action == "COMMIT":
-        planner_agent.app.update_state(config, {"approved": True})
+        await planner_agent.app.aupdate_state(config, {"approved": True})
         # Resume
-        result = planner_agent.app.invoke(None, config=config)
+        result = await planner_agent.app.ainvoke(None, config=config)
+        # The thread is finished; drop its checkpoints instead of waiting for the TTL
+        await checkpoints.delete(thread_id)
         return {
             "status": "completed",
             "scheduled_plan": result.get('scheduled_plan', []),
@@ -213,9 +501,9 @@ def agent_feedback(thread_id: str, action: str, request: Request, feedback: str
         }
         
     elif action == "UPDATE":
-        planner_agent.app.update_state(config, {"feedback": feedback, "approved": False})
-        # Resume - logic in graph will route back to generate_roadmap
-        result = planner_agent.app.invoke(None, config=config)
+        await planner_agent.app.aupdate_state(config, {"feedback": feedback, "approved": False})
+        # Resume - logic in graph will route to revise_roadmap (patch) or generate_roadmap
+        result = await planner_agent.app.ainvoke(None, config=config)
         return {
             "status": "paused",
             "roadmap": result.get('roadmap', []),
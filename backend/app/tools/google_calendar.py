@@ -1,11 +1,121 @@
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from google.auth.exceptions import TransportError
 from app.core.config import settings
+from app.core.availability import parse_rfc3339
+from app.core.telemetry import traced
+from collections import OrderedDict
+from typing import List
 import datetime
+import functools
+import hashlib
+import httplib2
+import random
+import threading
+import time
+import uuid
+
+# Maximum number of calls the Calendar batch endpoint accepts per request
+BATCH_LIMIT = 50
+# Client errors that will not succeed on retry
+NON_RETRYABLE_STATUSES = (400, 401, 403, 404)
+# Failures of a whole batch request: API errors and transport errors (timeouts, resets, DNS)
+TRANSPORT_ERRORS = (HttpError, httplib2.HttpLib2Error, TransportError, OSError)
+# freeBusy rejects overly long ranges, so long horizons are fetched in windows
+FREEBUSY_WINDOW = datetime.timedelta(days=60)
+
+
+def _build_calendar_service(creds: Credentials):
+    return build('calendar', 'v3', credentials=creds, cache_discovery=False)
+
+
+class CalendarServicePool:
+    """
+    Bounded LRU cache of Calendar API clients keyed by access token.
+    Building a client parses the discovery document and opens a new HTTP transport,
+    so reusing one per credential keeps repeated calls on a warm connection.
+
+    httplib2 transports are not thread-safe, so each token holds one client per worker
+    thread. The LRU bound counts tokens (users), not (token, thread) pairs: one user's
+    calls spread over the asyncio and anyio thread pools (~70 threads) must not evict
+    everybody else's clients.
+    """
+
+    def __init__(self, max_size: int = 64, builder=_build_calendar_service):
+        self.max_size = max_size
+        self.builder = builder
+        self.hits = 0
+        self.misses = 0
+        # token -> (creds, {thread id: service})
+        self._services = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _token(creds: Credentials):
+        return getattr(creds, 'token', None) or id(creds)
+
+    def get(self, creds: Credentials):
+        token = self._token(creds)
+        thread = threading.get_ident()
+        with self._lock:
+            entry = self._services.get(token)
+            if entry is not None and getattr(entry[0], 'expired', False):
+                # Token expired: drop its clients so fresh ones pick up new credentials
+                del self._services[token]
+                entry = None
+            if entry is not None:
+                self._services.move_to_end(token)
+                service = entry[1].get(thread)
+                if service is not None:
+                    self.hits += 1
+                    return service
+            self.misses += 1
+
+        service = self.builder(creds)
+        with self._lock:
+            entry = self._services.setdefault(token, (creds, {}))
+            entry[1][thread] = service
+            self._services.move_to_end(token)
+            while len(self._services) > self.max_size:
+                self._services.popitem(last=False)
+        return service
+
+    def invalidate(self, creds: Credentials):
+        with self._lock:
+            self._services.pop(self._token(creds), None)
+
+    def clear(self):
+        with self._lock:
+            self._services.clear()
+
+
+def drops_revoked_tokens(method):
+    """Evicts the caller's pooled clients when Google answers 401, so revoked or expired tokens are not reused."""
+    @functools.wraps(method)
+    def wrapper(self, creds, *args, **kwargs):
+        try:
+            return method(self, creds, *args, **kwargs)
+        except HttpError as e:
+            if e.resp.status == 401:
+                self.pool.invalidate(creds)
+            raise
+    return wrapper
+
+
+# Shared by every GoogleCalendarTool instance (SchedulerAgent, PlannerAgent, main app)
+service_pool = CalendarServicePool()
+
+USERINFO_URL = 'https://openidconnect.googleapis.com/v1/userinfo'
+# access token -> Google account id
+_user_ids = OrderedDict()
+_user_ids_lock = threading.Lock()
 
 class GoogleCalendarTool:
-    def __init__(self):
+    def __init__(self, pool: CalendarServicePool = None):
+        self.pool = pool or service_pool
         self.scopes = ['https://www.googleapis.com/auth/calendar']
         self.redirect_uri = settings.GOOGLE_REDIRECT_URI
         self.client_config = {
@@ -26,6 +136,7 @@ class GoogleCalendarTool:
         auth_url, _ = flow.authorization_url(prompt='consent')
         return auth_url
 
+    @traced("calendar")
     def authenticate(self, code: str):
         flow = Flow.from_client_config(
             self.client_config,
@@ -36,8 +147,33 @@ class GoogleCalendarTool:
         creds = flow.credentials
         return creds
 
+    @traced("calendar")
+    def get_user_id(self, creds: Credentials):
+        """
+        Stable Google account id ("sub") for the credentials, used to namespace the knowledge base.
+        Cached per access token so only the first request with a token pays the userinfo round trip.
+        """
+        token = getattr(creds, 'token', None)
+        with _user_ids_lock:
+            if token in _user_ids:
+                _user_ids.move_to_end(token)
+                return _user_ids[token]
+
+        session = AuthorizedSession(creds)
+        response = session.get(USERINFO_URL, timeout=10)
+        response.raise_for_status()
+        user_id = response.json()['sub']
+
+        with _user_ids_lock:
+            _user_ids[token] = user_id
+            while len(_user_ids) > 1024:
+                _user_ids.popitem(last=False)
+        return user_id
+
+    @traced("calendar")
+    @drops_revoked_tokens
     def list_events(self, creds: Credentials, start_time: datetime.datetime, end_time: datetime.datetime):
-        service = build('calendar', 'v3', credentials=creds)
+        service = self.pool.get(creds)
         events_result = service.events().list(
             calendarId='primary',
             timeMin=start_time.isoformat() + 'Z',
@@ -47,13 +183,32 @@ class GoogleCalendarTool:
         ).execute()
         return events_result.get('items', [])
 
+    @traced("calendar")
+    @drops_revoked_tokens
+    def get_busy_intervals(self, creds: Credentials, start_time: datetime.datetime, end_time: datetime.datetime):
+        # One freeBusy round trip per FREEBUSY_WINDOW covers the whole search window
+        service = self.pool.get(creds)
+        busy = []
+        window_start = start_time
+        while window_start < end_time:
+            window_end = min(window_start + FREEBUSY_WINDOW, end_time)
+            body = {
+                'timeMin': window_start.isoformat() + 'Z',
+                'timeMax': window_end.isoformat() + 'Z',
+                'items': [{'id': 'primary'}],
+            }
+            result = service.freebusy().query(body=body).execute()
+            busy.extend(result.get('calendars', {}).get('primary', {}).get('busy', []))
+            window_start = window_end
+        return [(parse_rfc3339(b['start']), parse_rfc3339(b['end'])) for b in busy]
+
     def check_availability(self, creds: Credentials, start_time: datetime.datetime, end_time: datetime.datetime):
         events = self.list_events(creds, start_time, end_time)
         return len(events) == 0
 
-    def create_event(self, creds: Credentials, summary: str, start_time: datetime.datetime, end_time: datetime.datetime):
-        service = build('calendar', 'v3', credentials=creds)
-        event = {
+    @staticmethod
+    def _event_body(summary: str, start_time: datetime.datetime, end_time: datetime.datetime):
+        return {
             'summary': summary,
             'start': {
                 'dateTime': start_time.isoformat(),
@@ -64,5 +219,110 @@ class GoogleCalendarTool:
                 'timeZone': 'UTC',
             },
         }
+
+    @traced("calendar")
+    @drops_revoked_tokens
+    def create_event(self, creds: Credentials, summary: str, start_time: datetime.datetime, end_time: datetime.datetime):
+        service = self.pool.get(creds)
+        event = self._event_body(summary, start_time, end_time)
         event = service.events().insert(calendarId='primary', body=event).execute()
         return event
+
+    @staticmethod
+    def event_id(key: str) -> str:
+        # Calendar ids must be base32hex; hex digits are a subset of that alphabet
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:40]
+
+    @traced("calendar")
+    def create_events(self, creds: Credentials, events: List[dict], max_attempts: int = 3):
+        """
+        Bulk-inserts events ({summary, start, end, optional key}) through the Calendar batch API.
+        Returns one result per input, in order: {"status": "created" | "failed", "event_id", "error"},
+        plus "start"/"end" when the event already existed.
+
+        Each event gets a client-assigned id, derived from its `key` when given (e.g. plan thread
+        and session), so retrying a request whose response was lost, or repeating the whole
+        operation, comes back as 409 instead of creating a duplicate. Transport errors and
+        retryable API errors are retried with exponential backoff.
+        """
+        service = self.pool.get(creds)
+        results = []
+        for item in events:
+            body = self._event_body(item['summary'], item['start'], item['end'])
+            body['id'] = self.event_id(item['key']) if item.get('key') else uuid.uuid4().hex
+            results.append({"status": "pending", "event_id": body['id'], "error": None, "body": body})
+
+        pending = list(range(len(results)))
+        existing = []
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(min(8.0, 2 ** attempt) * (0.5 + random.random()))
+            failed = []
+            for i in pending:
+                results[i]['status'] = "pending"
+            for offset in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[offset:offset + BATCH_LIMIT]
+
+                def callback(request_id, response, exception):
+                    i = int(request_id)
+                    result = results[i]
+                    if exception is None:
+                        result.update(status="created", error=None)
+                    elif isinstance(exception, HttpError) and exception.resp.status == 409:
+                        # Created by an earlier attempt whose response never reached us
+                        result.update(status="created", error=None)
+                        existing.append(i)
+                    else:
+                        status = exception.resp.status if isinstance(exception, HttpError) else None
+                        if status == 401:
+                            self.pool.invalidate(creds)
+                        result.update(status="failed", error=str(exception))
+                        if status not in NON_RETRYABLE_STATUSES:
+                            failed.append(i)
+
+                batch = service.new_batch_http_request(callback=callback)
+                for i in chunk:
+                    batch.add(service.events().insert(calendarId='primary', body=results[i]['body']), request_id=str(i))
+                try:
+                    batch.execute()
+                except TRANSPORT_ERRORS as e:
+                    if isinstance(e, HttpError) and e.resp.status == 401:
+                        self.pool.invalidate(creds)
+                    # The whole batch request failed (possibly after Google applied part of it);
+                    # retry every item that did not report back, earlier inserts will answer 409
+                    retryable = not (isinstance(e, HttpError) and e.resp.status in NON_RETRYABLE_STATUSES)
+                    for i in chunk:
+                        if results[i]['status'] == "pending":
+                            results[i].update(status="failed", error=str(e))
+                            if retryable:
+                                failed.append(i)
+            pending = failed
+
+        if existing:
+            self._fill_existing(service, results, existing)
+        for result in results:
+            del result['body']
+        return results
+
+    def _fill_existing(self, service, results: List[dict], indexes: List[int]):
+        # A repeated operation may have placed the event elsewhere the first time; report where it is
+        for offset in range(0, len(indexes), BATCH_LIMIT):
+            def callback(request_id, response, exception):
+                if exception is None and response.get('status') == "cancelled":
+                    # Ids of deleted events also answer 409, but nothing is on the calendar
+                    results[int(request_id)].update(status="failed", error="Event was deleted from the calendar")
+                elif exception is None and 'dateTime' in response.get('start', {}):
+                    results[int(request_id)].update(
+                        start=parse_rfc3339(response['start']['dateTime']),
+                        end=parse_rfc3339(response['end']['dateTime'])
+                    )
+
+            batch = service.new_batch_http_request(callback=callback)
+            for i in indexes[offset:offset + BATCH_LIMIT]:
+                batch.add(service.events().get(calendarId='primary', eventId=results[i]['event_id']), request_id=str(i))
+            try:
+                batch.execute()
+            except TRANSPORT_ERRORS as e:
+                print(f"Could not read back existing events: {e}")
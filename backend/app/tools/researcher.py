@@ -1,16 +1,116 @@
-from app.core.vector_store import get_index, setup_embeddings
+from app.core.vector_store import DEFAULT_OWNER, get_index, setup_embeddings
+from app.core.semantic_cache import SemanticCache
+from app.core.config import settings
+from app.core.retrieval import BM25Index, BudgetReranker, HybridRetriever
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core import QueryBundle, Settings
+import asyncio
+import threading
 
 class ResearcherTool:
     def __init__(self):
         # Ensure embeddings are setup
         setup_embeddings()
-        self.index = get_index()
-        self.query_engine = self.index.as_query_engine()
+        self.embed_model = Settings.embedding_model
+        # One query engine and semantic cache per owner namespace, built on first use
+        self._engines = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self.query_engine = self.get_query_engine(DEFAULT_OWNER)
+        self.cache = self.get_cache(DEFAULT_OWNER)
 
-    def research(self, query: str) -> str:
+    def get_query_engine(self, owner: str = DEFAULT_OWNER) -> BaseQueryEngine:
+        with self._lock:
+            if owner not in self._engines:
+                # Hybrid dense + BM25 retrieval over the owner's collection only,
+                # reranked and trimmed to a token budget before synthesis
+                retriever = HybridRetriever(
+                    vector_retriever=get_index(owner).as_retriever(similarity_top_k=settings.RETRIEVAL_VECTOR_TOP_K),
+                    bm25=BM25Index(owner=owner),
+                    bm25_top_k=settings.RETRIEVAL_BM25_TOP_K,
+                    rrf_k=settings.RETRIEVAL_RRF_K
+                )
+                reranker = BudgetReranker(top_n=settings.RERANK_TOP_N, token_budget=settings.CONTEXT_TOKEN_BUDGET)
+                self._engines[owner] = RetrieverQueryEngine.from_args(
+                    retriever=retriever,
+                    node_postprocessors=[reranker],
+                    llm=Settings.llm
+                )
+            return self._engines[owner]
+
+    def get_cache(self, owner: str = DEFAULT_OWNER) -> SemanticCache:
+        with self._lock:
+            if owner not in self._caches:
+                self._caches[owner] = SemanticCache(
+                    max_size=settings.RESEARCH_CACHE_SIZE,
+                    ttl_seconds=settings.RESEARCH_CACHE_TTL_SECONDS,
+                    threshold=settings.RESEARCH_CACHE_THRESHOLD,
+                    owner=owner
+                )
+            return self._caches[owner]
+
+    def cache_stats(self) -> dict:
+        """Semantic-cache counters summed over every owner's cache."""
+        with self._lock:
+            caches = list(self._caches.values())
+        totals = {}
+        for cache in caches:
+            for key, value in cache.stats().items():
+                if key != "hit_ratio":
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def research(self, query: str, owner: str = DEFAULT_OWNER, cache_key: str = None) -> str:
+        """
+        Queries the owner's knowledge base for the given topic.
+        Near-duplicate requests are answered from the semantic cache without an LLM call. The cache
+        is keyed on `cache_key` (the bare topic) when given: embedding a templated prompt lets the
+        shared template dominate, so unrelated topics would look near-identical.
         """
-        Queries the knowledge base for the given topic.
+        cache = self.get_cache(owner)
+        # Captured before retrieval so an ingest finishing meanwhile keeps this answer out of the cache
+        generation = cache.generation()
+        if cache_key:
+            key_embedding = self.embed_model.get_query_embedding(cache_key)
+            embedding = None
+        else:
+            key_embedding = embedding = self.embed_model.get_query_embedding(query)
+        cached = cache.lookup(key_embedding, generation)
+        if cached is not None:
+            return cached
+
+        if embedding is None:
+            # Only embed the full query once the cache has missed
+            embedding = self.embed_model.get_query_embedding(query)
+        # Reuse the embedding for retrieval instead of embedding the query twice
+        response = self.get_query_engine(owner).query(QueryBundle(query_str=query, embedding=embedding))
+        summary = str(response)
+        cache.store(key_embedding, summary, generation)
+        return summary
+
+    async def aresearch(self, query: str, owner: str = DEFAULT_OWNER, cache_key: str = None) -> str:
         """
-        response = self.query_engine.query(query)
-        return str(response)
+        Async variant of research; embeddings and synthesis run on the event loop,
+        blocking Chroma reads in worker threads.
+        """
+        cache = await asyncio.to_thread(self.get_cache, owner)
+        generation = await asyncio.to_thread(cache.generation)
+        if cache_key:
+            key_embedding = await self.embed_model.aget_query_embedding(cache_key)
+            embedding = None
+        else:
+            key_embedding = embedding = await self.embed_model.aget_query_embedding(query)
+        cached = cache.lookup(key_embedding, generation)
+        if cached is not None:
+            return cached
+
+        if embedding is None:
+            # Only embed the full query once the cache has missed
+            embedding = await self.embed_model.aget_query_embedding(query)
+        # The first call for an owner opens its collection
+        engine = await asyncio.to_thread(self.get_query_engine, owner)
+        response = await engine.aquery(QueryBundle(query_str=query, embedding=embedding))
+        summary = str(response)
+        await asyncio.to_thread(cache.store, key_embedding, summary, generation)
+        return summary
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: cold (build per call) vs warm (pooled) Calendar client latency.
+
+Runs fully offline: the client is built from the discovery document bundled with
+google-api-python-client and every HTTP request is answered by a local stub.
+
+    python benchmarks/bench_calendar_service.py --calls 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# GoogleCalendarTool reads OAuth settings at import time
+for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMock
+
+from app.tools.google_calendar import CalendarServicePool, GoogleCalendarTool
+
+
+class StubHttp(HttpMock):
+    """Answers every request with an empty events list."""
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=1, connection_type=None):
+        self.uri = uri
+        return httplib2.Response({"status": "200"}), json.dumps({"items": []}).encode()
+
+
+class StubCreds:
+    token = "bench-token"
+    expired = False
+
+
+def stub_builder(creds):
+    return build("calendar", "v3", http=StubHttp(), static_discovery=True)
+
+
+class ColdPool(CalendarServicePool):
+    """Reproduces the old behaviour: a fresh client for every call."""
+
+    def get(self, creds):
+        self.misses += 1
+        return self.builder(creds)
+
+
+def measure(tool, calls):
+    creds = StubCreds()
+    start = datetime(2026, 1, 1, 9)
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        tool.list_events(creds, start, start + timedelta(hours=1))
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<6} mean={statistics.mean(samples):8.3f}ms  p50={statistics.median(samples):8.3f}ms  p99={p99:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    cold = measure(GoogleCalendarTool(pool=ColdPool(builder=stub_builder)), args.calls)
+    warm_pool = CalendarServicePool(builder=stub_builder)
+    warm = measure(GoogleCalendarTool(pool=warm_pool), args.calls)
+
+    report("cold", cold)
+    report("warm", warm)
+    print(f"speedup={statistics.mean(cold) / statistics.mean(warm):.1f}x  pool hits={warm_pool.hits} misses={warm_pool.misses}")
+
+
+if __name__ == "__main__":
+    main()
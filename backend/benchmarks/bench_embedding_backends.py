@@ -0,0 +1,64 @@
+"""
+Embedding throughput per backend on synthetic ingestion-sized chunks.
+
+Backends whose package is not installed (or, for gemini, without a real GEMINI_API_KEY)
+are skipped. The embedding cache is bypassed so every text is actually embedded.
+
+    python benchmarks/bench_embedding_backends.py --chunks 512 --backends fastembed huggingface
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.core.config requires these; "bench" stands for "not configured"
+for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+from app.core.embeddings import DEFAULT_EMBEDDING_MODELS, BatchEmbedder, build_embed_model
+
+
+class NoCache:
+    def get_many(self, model, text_hashes):
+        return {}
+
+    def put_many(self, model, items):
+        pass
+
+
+def synthetic_chunks(count: int, words: int, rng: random.Random):
+    vocabulary = [f"term{i}" for i in range(5000)]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", choices=list(DEFAULT_EMBEDDING_MODELS), default=["fastembed", "huggingface"])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--words", type=int, default=350, help="words per chunk (~512 tokens)")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks, args.words, random.Random(0))
+    for backend in args.backends:
+        if backend == "gemini" and os.environ["GEMINI_API_KEY"] == "bench":
+            print(f"{backend:<12} skipped (no GEMINI_API_KEY)")
+            continue
+        try:
+            model = build_embed_model(backend)
+        except ImportError as e:
+            print(f"{backend:<12} skipped ({e})")
+            continue
+        embedder = BatchEmbedder(model, cache=NoCache())
+        # Warm-up loads weights / sessions outside the timed run
+        embedder.embed_texts(texts[:8])
+        t0 = time.perf_counter()
+        vectors = embedder.embed_texts(texts)
+        elapsed = time.perf_counter() - t0
+        print(f"{backend:<12} {embedder.model_id:<28} dim={len(vectors[0])} {len(texts) / elapsed:8.1f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Query latency vs. total corpus size: one global collection vs. per-user collections.
+
+Builds synthetic corpora in an in-memory Chroma client. Each user owns a fixed number
+of chunks; the total grows with the number of users. Three strategies are compared:
+  global     - single collection, no filter (the old behaviour; also leaks across users)
+  filtered   - single collection with an owner metadata filter pushed into the query
+  per-user   - one collection per user (what the app does now)
+
+    python benchmarks/bench_scoped_retrieval.py --chunks-per-user 500 --users 1 10 50
+"""
+import argparse
+import statistics
+import time
+
+import chromadb
+import numpy as np
+
+
+def build(client, users: int, chunks_per_user: int, dim: int, rng):
+    shared = client.create_collection("global")
+    collections = {}
+    for u in range(users):
+        owner = f"user{u}"
+        vectors = rng.standard_normal((chunks_per_user, dim)).astype(np.float32)
+        ids = [f"{owner}-{i}" for i in range(chunks_per_user)]
+        docs = [f"chunk {i} of {owner}" for i in range(chunks_per_user)]
+        metas = [{"owner": owner} for _ in range(chunks_per_user)]
+        for start in range(0, chunks_per_user, 1000):
+            end = start + 1000
+            shared.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(), documents=docs[start:end], metadatas=metas[start:end])
+        own = client.create_collection(owner)
+        for start in range(0, chunks_per_user, 1000):
+            end = start + 1000
+            own.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(), documents=docs[start:end], metadatas=metas[start:end])
+        collections[owner] = own
+    return shared, collections
+
+
+def time_queries(fn, queries):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--chunks-per-user", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'users':>6}{'total chunks':>14}{'global ms':>12}{'filtered ms':>13}{'per-user ms':>13}")
+    for users in args.users:
+        client = chromadb.EphemeralClient()
+        for c in client.list_collections():
+            client.delete_collection(c if isinstance(c, str) else c.name)
+        shared, collections = build(client, users, args.chunks_per_user, args.dim, rng)
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32).tolist()
+        owner = "user0"
+
+        global_ms = time_queries(lambda q: shared.query(query_embeddings=[q], n_results=args.top_k), queries)
+        filtered_ms = time_queries(
+            lambda q: shared.query(query_embeddings=[q], n_results=args.top_k, where={"owner": owner}), queries
+        )
+        per_user_ms = time_queries(lambda q: collections[owner].query(query_embeddings=[q], n_results=args.top_k), queries)
+        print(f"{users:>6}{users * args.chunks_per_user:>14}{global_ms:>12.2f}{filtered_ms:>13.2f}{per_user_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
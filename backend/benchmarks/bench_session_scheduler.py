@@ -0,0 +1,53 @@
+"""
+Benchmark for SessionScheduler over synthetic dense calendars.
+
+Generates a calendar where most working hours are already booked, a long roadmap,
+and reports how long it takes to place every session.
+
+    python benchmarks/bench_session_scheduler.py --items 200 --density 0.7 --days 180
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.session_scheduler import SchedulingConstraints, SessionScheduler
+from benchmarks.synthetic import dense_calendar
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--density", type=float, default=0.7)
+    parser.add_argument("--hours-per-week", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    start = datetime(2026, 1, 5, 8)
+    busy = dense_calendar(start, args.days, args.density, rng)
+    roadmap = [{"topic": f"Topic {i}", "duration_hours": rng.randint(1, 10)} for i in range(args.items)]
+    constraints = SchedulingConstraints(
+        weekly_cap_hours=args.hours_per_week,
+        preferred_hours=(18, 21),
+        horizon_days=args.days,
+    )
+
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        sessions, unscheduled = SessionScheduler(constraints).schedule(roadmap, busy, start)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    last = max(s["end"] for s in sessions) if sessions else start
+    print(f"busy intervals={len(busy)} items={args.items} sessions placed={len(sessions)} unscheduled={len(unscheduled)}")
+    print(f"span={(last - start).days} days  best={min(timings):.1f}ms  mean={sum(timings) / len(timings):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark for the FastAPI app.
+
+Imports `app.main` in a fresh interpreter under `python -X importtime`, prints the
+slowest top-level packages and fails (exit code 1) when the import exceeds the budget.
+
+    python benchmarks/bench_startup.py --budget 1.0 --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+HEAVY = ("llama_index", "chromadb", "langgraph", "googleapiclient", "google.generativeai")
+
+
+def profile(module: str):
+    env = dict(os.environ)
+    for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+        env.setdefault(var, "bench")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"importing {module} failed")
+
+    # Attribute each module's self time to its top-level package
+    per_package = defaultdict(int)
+    loaded = set()
+    for match in LINE.finditer(proc.stderr):
+        self_us, name = int(match.group(1)), match.group(4)
+        per_package[name.split(".")[0]] += self_us
+        loaded.add(name)
+    return wall, per_package, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget", type=float, default=1.0, help="max seconds for a cold import")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    wall, per_package, loaded = profile(args.module)
+    total_us = sum(per_package.values())
+
+    print(f"{'package':<32}{'self ms':>10}{'share':>8}")
+    for package, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{package:<32}{us / 1000:>10.1f}{us / total_us:>8.1%}")
+    print(f"\nimport {args.module}: {total_us / 1e6:.3f}s in imports, {wall:.3f}s wall (incl. interpreter start)")
+
+    heavy = sorted(h for h in HEAVY if h in loaded)
+    if heavy:
+        print(f"eagerly imported heavy packages: {', '.join(heavy)}")
+
+    if total_us / 1e6 > args.budget:
+        print(f"FAIL: over the {args.budget:.2f}s budget")
+        raise SystemExit(1)
+    print(f"OK: within the {args.budget:.2f}s budget")
+
+
+if __name__ == "__main__":
+    main()
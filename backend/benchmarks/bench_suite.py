@@ -0,0 +1,268 @@
+"""
+Offline end-to-end benchmark suite with a regression check against a stored baseline.
+
+Runs /agent/run, /agent/feedback (UPDATE and COMMIT), /upload (until the ingestion job
+finishes) and /schedule/check through the ASGI app, with the real agents and
+ResearcherTool. The LLM and embedding model are deterministic stubs with configurable
+latency and Google Calendar is a seeded, dense in-memory calendar, so no keys or network
+are needed. Chroma, the manifest and the
+embedding cache live in a temporary directory.
+
+    python benchmarks/bench_suite.py --update-baseline        # record benchmarks/baseline.json
+    python benchmarks/bench_suite.py                          # compare; exit 1 on regression, 2 without a baseline
+    python benchmarks/bench_suite.py --only run schedule_check --requests 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+    os.environ.setdefault(var, "bench")
+os.environ.setdefault("CHECKPOINTER_BACKEND", "memory")
+os.environ.setdefault("STARTUP_MODE", "lazy")
+os.environ.setdefault("TRACE_REQUESTS", "false")
+
+import chromadb
+import httpx
+from fpdf import FPDF
+from google.oauth2.credentials import Credentials
+from llama_index.core import Settings
+
+import app.core.embeddings as embeddings
+import app.core.jobs as jobs
+import app.core.manifest as manifest
+import app.core.vector_store as vector_store
+from app.core.lazy import lazy
+from app.core.telemetry import instrument_llama_index
+from benchmarks.stubs import InMemoryCalendar, StubEmbedding, StubLLM
+
+SCENARIOS = ("run", "feedback_update", "feedback_commit", "upload", "schedule_check")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def install_stubs(args, data_dir: str):
+    llm = StubLLM(latency=args.llm_latency)
+    embed_model = StubEmbedding(latency=args.embed_latency)
+    calendar = InMemoryCalendar(days=args.calendar_days, density=args.density, latency=args.calendar_latency)
+
+    def setup_embeddings():
+        Settings.embedding_model = embed_model
+        Settings.llm = llm
+        instrument_llama_index()
+
+    # Must run before app.main builds anything so no Gemini client or on-disk store is touched
+    vector_store.setup_embeddings = setup_embeddings
+    vector_store._client = chromadb.EphemeralClient()
+    manifest.DATA_DIR = data_dir
+    embeddings.DATA_DIR = data_dir
+    jobs.DATA_DIR = data_dir
+    setup_embeddings()
+
+    from app import main
+    main.get_calendar_tool = lazy(lambda: calendar)
+    main.get_orchestrator_agent().llm = llm
+    main.get_scheduler_agent().calendar_tool = calendar
+    planner_agent = main.get_planner_agent()
+    planner_agent.llm = llm
+    # The real ResearcherTool stays: its retrieval, reranking and semantic cache run over the
+    # stubbed models, so research cost is part of what the suite measures
+    planner_agent.calendar = calendar
+    # /schedule/check only works with the dev creds from /auth/google
+    main.user_creds['default'] = Credentials(token="bench-dev")
+    return main.app, calendar
+
+
+def make_pdf(path: str, seed: int, pages: int):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for page in range(pages):
+        pdf.add_page()
+        for line in range(40):
+            pdf.cell(0, 6, txt=f"Document {seed} page {page} line {line}: synthetic study notes on topic {(seed + line) % 17}.", ln=1)
+    pdf.output(path)
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0, "errors": errors, "throughput": 0.0, "p50_ms": None, "p99_ms": None}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 1),
+    }
+
+
+async def measure(fn, count: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                await fn(i)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"  first error: {e!r}")
+                return
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_suite(app, calendar: InMemoryCalendar, args, data_dir: str) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer bench-token"}
+    results = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def agent_run(i):
+            res = await client.post("/agent/run", params={"query": f"I want to learn topic {i}"}, headers=headers)
+            res.raise_for_status()
+            return res.json()["thread_id"]
+
+        async def feedback(thread_id, action):
+            params = {"thread_id": thread_id, "action": action}
+            if action == "UPDATE":
+                params["feedback"] = "Make the introduction longer"
+            res = await client.post("/agent/feedback", params=params, headers=headers)
+            res.raise_for_status()
+
+        if "run" in args.only:
+            results["run"] = await measure(agent_run, args.requests, args.concurrency)
+
+        if "feedback_update" in args.only or "feedback_commit" in args.only:
+            # Paused threads to resume are created up front and not timed
+            threads = await asyncio.gather(*(agent_run(i) for i in range(args.requests)))
+            if "feedback_update" in args.only:
+                results["feedback_update"] = await measure(lambda i: feedback(threads[i], "UPDATE"), args.requests, args.concurrency)
+            if "feedback_commit" in args.only:
+                results["feedback_commit"] = await measure(lambda i: feedback(threads[i], "COMMIT"), args.requests, args.concurrency)
+
+        if "upload" in args.only:
+            pdfs = []
+            for i in range(args.uploads):
+                path = os.path.join(data_dir, f"bench_{i}.pdf")
+                make_pdf(path, i, args.pdf_pages)
+                pdfs.append(path)
+
+            async def upload(i):
+                # Timed until the ingestion job finishes, not just until the 202
+                with open(pdfs[i], "rb") as f:
+                    content = f.read()
+                while True:
+                    res = await client.post("/upload", files={"file": (f"bench_{i}.pdf", content, "application/pdf")}, headers=headers)
+                    if res.status_code != 429:
+                        break
+                    await asyncio.sleep(0.05)
+                res.raise_for_status()
+                job_id = res.json()["job_id"]
+                while True:
+                    job = (await client.get(f"/upload/{job_id}", headers=headers)).json()
+                    if job["state"] == "succeeded":
+                        return
+                    if job["state"] == "failed":
+                        raise RuntimeError(job.get("error"))
+                    await asyncio.sleep(0.02)
+
+            results["upload"] = await measure(upload, args.uploads, args.concurrency)
+
+        if "schedule_check" in args.only:
+            async def schedule_check(i):
+                # Hour-long requests spread over the dense calendar; most conflict and get suggestions
+                start = calendar.start + timedelta(days=1 + i % 14, hours=9 + i % 10)
+                res = await client.post("/schedule/check", params={
+                    "start_time": start.isoformat(),
+                    "end_time": (start + timedelta(hours=1)).isoformat(),
+                })
+                res.raise_for_status()
+
+            results["schedule_check"] = await measure(schedule_check, args.requests, args.concurrency)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Latency above baseline * (1 + tolerance), or throughput below baseline * (1 - tolerance), is a regression."""
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get("results", {}).get(scenario)
+        if not previous or current["p50_ms"] is None:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if previous.get(key) and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{scenario} {key}: {current[key]} > {previous[key]}")
+        if previous.get("throughput") and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{scenario} throughput: {current['throughput']} < {previous['throughput']}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{scenario} errors: {current['errors']} > {previous.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario (except upload)")
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per stubbed LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="seconds per stubbed embedding batch")
+    parser.add_argument("--calendar-latency", type=float, default=0.02, help="seconds per stubbed Calendar call")
+    parser.add_argument("--calendar-days", type=int, default=120)
+    parser.add_argument("--density", type=float, default=0.6, help="fraction of each day already booked")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    params = {k: v for k, v in vars(args).items() if k not in ("baseline", "update_baseline", "tolerance", "only")}
+    with tempfile.TemporaryDirectory(prefix="aegis-bench-") as data_dir:
+        app, calendar = install_stubs(args, data_dir)
+        results = asyncio.run(run_suite(app, calendar, args, data_dir))
+
+    print(f"{'scenario':<16} {'n':>5} {'err':>4} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for scenario, r in results.items():
+        print(f"{scenario:<16} {r['requests']:>5} {r['errors']:>4} {r['throughput']:>8} {str(r['p50_ms']):>9} {str(r['p99_ms']):>9}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        # Nothing to compare against is a failed check, not a pass
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        sys.exit(2)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("params") != params:
+        print("Warning: baseline was recorded with different parameters; comparison may be meaningless.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("REGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Calibrates RESEARCH_CACHE_THRESHOLD for an embedding backend on labelled topic pairs.
+
+The research cache is keyed on the normalized topic, so these are topic strings as the
+orchestrator extracts them. "same" pairs should share one cached summary; "different"
+pairs must not. The threshold should sit above every "different" similarity.
+
+    python benchmarks/calibrate_research_cache.py --backend gemini
+    python benchmarks/calibrate_research_cache.py --backend fastembed --pairs my_pairs.json
+
+A pairs file is a JSON list of [topic_a, topic_b, "same" | "different"].
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+    os.environ.setdefault(var, "bench")
+
+from app.core.embeddings import build_embed_model
+from app.core.intent import fold
+
+PAIRS = [
+    ("Rust", "the Rust programming language", "same"),
+    ("machine learning", "Machine Learning", "same"),
+    ("linear algebra", "linear algebra basics", "same"),
+    ("Spanish", "the Spanish language", "same"),
+    ("how databases work", "database internals", "same"),
+    ("calculus", "differential and integral calculus", "same"),
+    ("Rust", "Go", "different"),
+    ("machine learning", "deep learning", "different"),
+    ("linear algebra", "abstract algebra", "different"),
+    ("Spanish", "Portuguese", "different"),
+    ("databases", "distributed systems", "different"),
+    ("organic chemistry", "inorganic chemistry", "different"),
+    ("Python", "Java", "different"),
+    ("world history", "European history", "different"),
+]
+
+
+def unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default=None, help="gemini, fastembed or huggingface (default: configured)")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--pairs", default=None, help="JSON file of [topic_a, topic_b, label] triples")
+    args = parser.parse_args()
+
+    if (args.backend or os.getenv("EMBEDDING_BACKEND", "gemini")) == "gemini" and os.environ["GEMINI_API_KEY"] == "bench":
+        sys.exit("The gemini backend needs a real GEMINI_API_KEY")
+    pairs = PAIRS
+    if args.pairs:
+        with open(args.pairs) as f:
+            pairs = [tuple(p) for p in json.load(f)]
+
+    model = build_embed_model(args.backend, args.model)
+    scores = {"same": [], "different": []}
+    for a, b, label in pairs:
+        score = float(unit(model.get_query_embedding(fold(a))) @ unit(model.get_query_embedding(fold(b))))
+        scores[label].append(score)
+        print(f"{label:<10} {score:.3f}  {a!r} / {b!r}")
+
+    highest_different = max(scores["different"])
+    lowest_same = min(scores["same"])
+    print(f"\nhighest 'different': {highest_different:.3f}   lowest 'same': {lowest_same:.3f}")
+    if highest_different < lowest_same:
+        print(f"Any threshold in ({highest_different:.3f}, {lowest_same:.3f}] separates these pairs; "
+              f"suggested RESEARCH_CACHE_THRESHOLD={(highest_different + lowest_same) / 2:.3f}")
+    else:
+        # A false hit serves another topic's summary, a false miss only costs an LLM call
+        print(f"Pairs overlap; keep RESEARCH_CACHE_THRESHOLD above {highest_different:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Load-test harness for /agent/run with stubbed LLM, research and Calendar backends.
+
+Fires `--requests` concurrent calls through the ASGI app and reports throughput.
+`--baseline` makes every stubbed LLM call hold a worker thread, which is how the
+old sync handlers behaved, so the two runs show the gain from the async path.
+
+    python benchmarks/load_agent_run.py --requests 200 --latency 0.2
+    python benchmarks/load_agent_run.py --requests 200 --latency 0.2 --baseline
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for var in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI", "GEMINI_API_KEY"):
+    os.environ.setdefault(var, "bench")
+os.environ.setdefault("CHECKPOINTER_BACKEND", "memory")
+
+import httpx
+from llama_index.core import MockEmbedding, Settings
+
+import app.core.vector_store as vector_store
+from benchmarks.stubs import StubCalendar, StubLLM, StubResearcher
+
+
+def install_stubs(latency: float, blocking: bool):
+    llm = StubLLM(latency=latency, blocking=blocking)
+
+    def setup_embeddings():
+        Settings.embedding_model = MockEmbedding(embed_dim=8)
+        Settings.llm = llm
+
+    # Must run before app.main imports the agents so no Gemini client is ever built
+    vector_store.setup_embeddings = setup_embeddings
+    setup_embeddings()
+
+    from app import main
+    main.get_orchestrator_agent().llm = llm
+    planner_agent = main.get_planner_agent()
+    planner_agent.llm = llm
+    planner_agent.researcher = StubResearcher(llm)
+    planner_agent.calendar = StubCalendar()
+
+    async def resolve_owner(creds):
+        return "bench-user"
+    # Skip the Google userinfo lookup
+    main.resolve_owner = resolve_owner
+    return main.app
+
+
+async def run(app, requests: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            t0 = time.perf_counter()
+            res = await client.post(
+                "/agent/run",
+                params={"query": f"I want to learn topic {i}"},
+                headers={"Authorization": "Bearer bench-token"},
+            )
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests={requests} elapsed={elapsed:.2f}s throughput={requests / elapsed:.1f} req/s")
+    print(f"p50={statistics.median(latencies) * 1000:.0f}ms p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stubbed LLM call")
+    parser.add_argument("--baseline", action="store_true", help="emulate blocking threadpool handlers")
+    args = parser.parse_args()
+
+    app = install_stubs(args.latency, args.baseline)
+    asyncio.run(run(app, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Deterministic, offline stand-ins for the LLM, embeddings, the researcher and Google Calendar.
+Latency is configurable so benchmarks exercise the real request path without keys.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, List
+
+import anyio
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+
+from app.core.availability import BusyIndex
+from benchmarks.synthetic import dense_calendar
+
+ROADMAP = [
+    {"topic": "Introduction", "duration_hours": 2},
+    {"topic": "Core Concepts", "duration_hours": 3},
+    {"topic": "Practice Project", "duration_hours": 4},
+]
+
+
+def stub_answer(prompt: str) -> str:
+    if "Classify the user input" in prompt:
+        if "meeting" in prompt.lower():
+            start = (datetime.utcnow() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+            return json.dumps({"intent": "schedule", "start_time": start.isoformat(), "duration_minutes": 60, "summary": "Meeting"})
+        return json.dumps({"intent": "learn", "topic": "Stub topic", "hours_per_week": 5})
+    if "revising an existing study roadmap" in prompt:
+        return json.dumps([{"op": "edit", "index": 0, "item": {"topic": "Introduction (revised)", "duration_hours": 3}}])
+    if "study roadmap" in prompt:
+        return json.dumps(ROADMAP)
+    return "Summary: fundamentals, core concepts, practice."
+
+
+class StubLLM(CustomLLM):
+    """
+    `blocking=True` makes async calls occupy a worker from the shared anyio thread pool,
+    reproducing the old sync handlers where every LLM call pinned a threadpool worker.
+    """
+
+    latency: float = 0.2
+    blocking: bool = False
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="stub-llm")
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=stub_answer(prompt))
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        if self.blocking:
+            await anyio.to_thread.run_sync(time.sleep, self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return CompletionResponse(text=stub_answer(prompt))
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        text = stub_answer(prompt)
+        time.sleep(self.latency)
+        yield CompletionResponse(text=text, delta=text)
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        text = stub_answer(prompt)
+        await asyncio.sleep(self.latency)
+
+        async def gen():
+            yield CompletionResponse(text=text, delta=text)
+        return gen()
+
+
+class StubEmbedding(BaseEmbedding):
+    """Hash-derived unit vectors: identical texts embed identically, different texts almost never do."""
+
+    model_name: str = "stub-embedding"
+    dim: int = 64
+    latency: float = 0.01  # per batch
+
+    def _vector(self, text: str) -> List[float]:
+        digest = b""
+        counter = 0
+        while len(digest) < self.dim:
+            digest += hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            counter += 1
+        values = [b / 127.5 - 1.0 for b in digest[:self.dim]]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+
+class StubResearcher:
+    def __init__(self, llm: StubLLM):
+        self.llm = llm
+
+    def research(self, query: str, owner: str = "default", cache_key: str = None) -> str:
+        return self.llm.complete(query).text
+
+    async def aresearch(self, query: str, owner: str = "default", cache_key: str = None) -> str:
+        return (await self.llm.acomplete(query)).text
+
+
+class InMemoryCalendar:
+    """
+    GoogleCalendarTool stand-in over a seeded, dense synthetic calendar. Every user sees the
+    same calendar; created events are added to it, so later requests see them as busy.
+    """
+
+    def __init__(self, days: int = 120, density: float = 0.6, latency: float = 0.02, seed: int = 0, start: datetime = None):
+        self.latency = latency
+        self.start = start or datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.busy = BusyIndex(dense_calendar(self.start, days, density, random.Random(seed)))
+        self.created = 0
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def get_user_id(self, creds):
+        return "user-" + hashlib.sha256(str(creds.token).encode("utf-8")).hexdigest()[:12]
+
+    def get_busy_intervals(self, creds, start_time, end_time):
+        time.sleep(self.latency)
+        with self._lock:
+            return [(s, e) for s, e in self.busy.intervals() if s < end_time and e > start_time]
+
+    def list_events(self, creds, start_time, end_time):
+        return [
+            {"start": {"dateTime": s.isoformat() + "Z"}, "end": {"dateTime": e.isoformat() + "Z"}}
+            for s, e in self.get_busy_intervals(creds, start_time, end_time)
+        ]
+
+    def check_availability(self, creds, start_time, end_time):
+        time.sleep(self.latency)
+        with self._lock:
+            return self.busy.is_free(start_time, end_time)
+
+    def create_event(self, creds, summary, start_time, end_time):
+        return self.create_events(creds, [{"summary": summary, "start": start_time, "end": end_time}])[0]
+
+    def create_events(self, creds, events, max_attempts: int = 3):
+        time.sleep(self.latency)
+        results = []
+        with self._lock:
+            for event in events:
+                event_id = hashlib.sha256(event["key"].encode("utf-8")).hexdigest()[:40] if event.get("key") else uuid.uuid4().hex
+                if event_id in self.events:
+                    # Same as the API's 409 on a client-assigned id
+                    start, end = self.events[event_id]
+                    results.append({"status": "created", "event_id": event_id, "error": None, "start": start, "end": end})
+                    continue
+                self.events[event_id] = (event["start"], event["end"])
+                self.busy.add(event["start"], event["end"])
+                results.append({"status": "created", "event_id": event_id, "error": None})
+            self.created += len(events)
+        return results
+
+
+class StubCalendar:
+    """Empty calendar with a fixed per-call latency."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def get_busy_intervals(self, creds, start_time, end_time):
+        time.sleep(self.latency)
+        return []
+
+    def check_availability(self, creds, start_time, end_time):
+        time.sleep(self.latency)
+        return True
+
+    def create_events(self, creds, events, max_attempts: int = 3):
+        time.sleep(self.latency)
+        return [{"status": "created", "event_id": f"stub{i}", "error": None} for i in range(len(events))]
@@ -0,0 +1,17 @@
+"""Seeded synthetic data shared by the benchmarks."""
+import random
+from datetime import datetime, timedelta
+
+
+def dense_calendar(start: datetime, days: int, density: float, rng: random.Random):
+    """Random 30-120 minute meetings between 8:00 and 22:00 until `density` of each day is busy."""
+    busy = []
+    for d in range(days):
+        day = start.replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=d)
+        booked = 0
+        while booked < density * 14 * 60:
+            length = rng.choice([30, 45, 60, 90, 120])
+            offset = rng.randrange(0, 14 * 60 - length, 15)
+            busy.append((day + timedelta(minutes=offset), day + timedelta(minutes=offset + length)))
+            booked += length
+    return busy
@@ -9,9 +9,10 @@ import { uploadFile } from '@/lib/api'
 interface ChatInputProps {
     onSend: (text: string) => void
     disabled?: boolean
+    accessToken?: string
 }
 
-export function ChatInput({ onSend, disabled }: ChatInputProps) {
+export function ChatInput({ onSend, disabled, accessToken }: ChatInputProps) {
     const [input, setInput] = useState('')
     const fileInputRef = useRef<HTMLInputElement>(null)
 
@@ -29,7 +30,7 @@ export function ChatInput({ onSend, disabled }: ChatInputProps) {
         const file = e.target.files?.[0]
         if (file) {
             try {
-                await uploadFile(file)
+                await uploadFile(file, accessToken)
                 // Ideally show a toast or add a system message
                 console.log('File uploaded')
             } catch (error) {
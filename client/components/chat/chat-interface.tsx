@@ -92,7 +92,7 @@ export function ChatInterface() {
                 ))}
                 {isLoading && <ThinkingIndicator />}
             </ScrollArea>
-            <ChatInput onSend={handleSend} disabled={isLoading} />
+            <ChatInput onSend={handleSend} disabled={isLoading} accessToken={session?.accessToken} />
         </div>
     )
 }
@@ -7,7 +7,9 @@ export async function runAgent(query: string, token?: string) {
         headers['Authorization'] = `Bearer ${token}`;
     }
 
-    const res = await fetch(`${API_URL}/agent/run?query=${encodeURIComponent(query)}`, {
+    // Lets the backend resolve relative times ("tomorrow at 3pm") in the user's timezone
+    const tz = Intl.DateTimeFormat().resolvedOptions().timeZone;
+    const res = await fetch(`${API_URL}/agent/run?query=${encodeURIComponent(query)}&tz=${encodeURIComponent(tz)}`, {
         method: 'POST',
         headers,
     });
@@ -40,6 +42,7 @@ export async function uploadFile(file: File, token?: string) {
 
     const res = await fetch(`${API_URL}/upload`, {
         method: 'POST',
+        headers,
         body: formData,
     });
     if (!res.ok) throw new Error('Failed to upload file');